@@ -0,0 +1,254 @@
+"""Load-test /api/main/ and /api/download_pdf/ against local stand-in upstreams.
+
+Starts the fake upstreams from fake_upstreams.py, runs the app in a child
+process pointed at them (with a scratch database, cache and log), drives
+`--requests` research calls for distinct companies at `--concurrency`,
+then downloads the resulting PDFs, and reports p50/p95/p99 latency,
+throughput, errors and the server's peak RSS as JSON. Nothing leaves the
+machine. With `--batch` the companies go to /api/batch/ as one request
+instead, and latency is measured to each company's line of the stream.
+
+    python -m benchmarks.bench_endpoints [--requests 40] [--concurrency 8]
+        [--latency gemini=1.5:0.3 --latency arxiv=0.8] [--scale 0.5]
+        [--fused] [--no-streaming] [--cache] [--batch] [--output results.json]
+
+`--latency name=median[:sigma]` sets an upstream's lognormal latency
+(upstreams: google, pages, huggingface, github, arxiv, kaggle, gemini), and
+`--scale` multiplies every median. Caches and rate limits are off unless
+`--cache` is given, so every request runs the full pipeline.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .fake_upstreams import DEFAULT_LATENCIES, start_upstreams, stop_upstreams
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_latencies(values, scale):
+    latencies = {name: (median * scale, sigma) for name, (median, sigma) in DEFAULT_LATENCIES.items()}
+    for value in values:
+        name, _, spec = value.partition("=")
+        if name not in latencies:
+            raise SystemExit(f"Unknown upstream {name!r}; expected one of {', '.join(latencies)}")
+        median, _, sigma = spec.partition(":")
+        latencies[name] = (float(median) * scale, float(sigma) if sigma else latencies[name][1])
+    return latencies
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(pid):
+    """Peak resident memory of `pid` and its children, from /proc (Linux only)."""
+    total_kb = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except (OSError, StopIteration, ValueError):
+            continue
+    return round(total_kb / 1024, 1) if total_kb else None
+
+
+def start_app(env, port, server_cmd):
+    subprocess.run([sys.executable, "manage.py", "migrate", "-v0"], cwd=PROJECT_DIR, env=env, check=True)
+    cmd = server_cmd.format(python=sys.executable, port=port).split()
+    process = subprocess.Popen(cmd, cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"App server exited with status {process.returncode}")
+        try:
+            requests.get(base_url + "/api/startup/", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("App server did not start within 60s")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(int(len(ordered) * q), len(ordered) - 1)] * 1000, 1)
+
+
+def drive(call, count, concurrency):
+    """Run `call(i)` for i in range(count) on `concurrency` threads and summarise it."""
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            result = call(i)
+            error = None
+        except requests.RequestException as e:
+            result, error = None, str(e)
+        return time.perf_counter() - started, result, error
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(timed, range(count)))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, result, error in outcomes if error is None]
+    return summarize(count, latencies, wall), [result for _, result, error in outcomes if error is None]
+
+
+def summarize(count, latencies, wall):
+    return {
+        "requests": count,
+        "ok": len(latencies),
+        "errors": count - len(latencies),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": percentile(latencies, 1.0),
+    }
+
+
+def run_batch(base_url, count, concurrency):
+    """Research `count` companies with one /api/batch/ call, timing each line of the stream."""
+    started = time.perf_counter()
+    latencies, reports, done = [], [], {}
+    try:
+        with requests.post(
+            base_url + "/api/batch/",
+            json={"queries": [f"Company {i}" for i in range(count)], "concurrency": concurrency},
+            stream=True, timeout=3600,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                data = json.loads(line)
+                if data.get("done"):
+                    done = data
+                elif data["status"] == "succeeded":
+                    latencies.append(time.perf_counter() - started)
+                    reports.append(data)
+    except requests.RequestException:
+        pass
+    summary = summarize(count, latencies, time.perf_counter() - started)
+    summary["shared_lookups"] = done.get("shared_lookups")
+    return summary, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40, help="research calls to /api/main/")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pdf-requests", type=int, default=None, help="PDF downloads (default: 2 per report)")
+    parser.add_argument("--latency", action="append", default=[], metavar="NAME=MEDIAN[:SIGMA]")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every upstream median latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument("--fused", action="store_true", help="use the fused overview + use cases Gemini call")
+    parser.add_argument("--no-streaming", action="store_true", help="use non-streaming Gemini calls")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM/HTTP caches and rate limits on")
+    parser.add_argument("--batch", action="store_true", help="send the research calls as one /api/batch/ request")
+    parser.add_argument("--server-cmd", default="{python} manage.py runserver 127.0.0.1:{port} --noreload",
+                        help="command starting the app; {python} and {port} are filled in")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    latencies = parse_latencies(args.latency, args.scale)
+    servers, upstream_env = start_upstreams(latencies, error_rate=args.error_rate)
+    scratch = tempfile.mkdtemp(prefix="research-bench-")
+    env = {
+        **os.environ,
+        **upstream_env,
+        "SQLITE_PATH": os.path.join(scratch, "db.sqlite3"),
+        "RESEARCH_CACHE_DIR": os.path.join(scratch, "cache"),
+        "LOG_FILE_PATH": os.path.join(scratch, "endpoint.log"),
+        "LLM_FUSED_MODE": "true" if args.fused else "false",
+        "LLM_STREAMING": "false" if args.no_streaming else "true",
+        "DJANGO_SETTINGS_MODULE": "main.settings",
+        "PYTHONPATH": PROJECT_DIR,
+    }
+    if not args.cache:
+        env.update({"LLM_CACHE_ENABLED": "false", "HTTP_CACHE_ENABLED": "false", "RATE_LIMIT_ENABLED": "false"})
+
+    port = free_port()
+    process, base_url = start_app(env, port, args.server_cmd)
+    try:
+        def research(i):
+            response = requests.post(base_url + "/api/main/", json={"query": f"Company {i}"}, timeout=300)
+            response.raise_for_status()
+            return response.json()
+
+        if args.batch:
+            main_summary, reports = run_batch(base_url, args.requests, args.concurrency)
+        else:
+            main_summary, reports = drive(research, args.requests, args.concurrency)
+        result_ids = [report["result_id"] for report in reports]
+        # Resource slots that came back as errors (timeouts, failed lookups)
+        main_summary["resource_errors"] = sum(
+            1
+            for report in reports
+            for entry in report["Resources"]["use_cases_resources"]
+            for items in entry["resources"].values()
+            if any("error" in item for item in items)
+        )
+
+        pdf_count = args.pdf_requests if args.pdf_requests is not None else 2 * len(result_ids)
+
+        def download(i):
+            response = requests.get(f"{base_url}/api/download_pdf/{result_ids[i % len(result_ids)]}/", timeout=120)
+            response.raise_for_status()
+            return len(response.content)
+
+        pdf_summary, _ = drive(download, pdf_count if result_ids else 0, args.concurrency)
+        peak_rss = peak_rss_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        stop_upstreams(servers)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "fused": args.fused,
+            "streaming": not args.no_streaming,
+            "cache": args.cache,
+            "batch": args.batch,
+            "error_rate": args.error_rate,
+            "server_cmd": args.server_cmd,
+            "upstream_latencies": {name: {"median_s": median, "sigma": sigma} for name, (median, sigma) in latencies.items()},
+        },
+        "endpoints": {"main": main_summary, "download_pdf": pdf_summary},
+        "server": {"peak_rss_mb": peak_rss},
+        "upstream_requests": {name: server.requests for name, server in servers.items()},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
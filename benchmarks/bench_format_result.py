@@ -0,0 +1,159 @@
+"""Benchmark the single-pass TextCleaner against the chained cleaning functions.
+
+The legacy path is what get_company_info used to run: a `str.replace` per
+unwanted phrase on every page, then clean_irrelevant_content,
+truncate_text and remove_duplicates over the joined text. The single-pass
+path is the cleaning get_company_info runs now, without the page dedupe
+and ranking around it: each page cut at its stop phrase, then one
+clean_scraped_text(..., truncated=True) sweep over the joined pages. It is
+timed twice: with exact duplicate sentences dropped only, like the legacy
+path ("exact"), and with reworded sentences dropped too, as shipped
+("near-dup").
+
+Corpora are built from the paragraphs of the recorded company page, with
+citation marks, boilerplate, irregular whitespace and repeated sentences
+mixed in, from a typical five-page scrape up to several megabytes, plus a
+scrape of lightly reworded mirrors of one page, where "out" shows how much
+of the budget the repeats take.
+
+The near-duplicate check costs roughly 10us per sentence read. On a
+small scrape that is most of the work, and the shipped cleaner is slower
+than the legacy chain there (a fraction of a millisecond per research run);
+from a few tens of kilobytes up it is faster, and it keeps reworded repeats
+out of the budget.
+
+    python -m benchmarks.bench_format_result [--repeat 50] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+
+from research_agent.format_result import (
+    UNWANTED_PHRASES,
+    TextCleaner,
+    clean_irrelevant_content,
+    clean_scraped_text,
+    remove_duplicates,
+    truncate_at_stop_phrase,
+    truncate_text,
+)
+from research_agent.research_main import ParagraphCollector
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "company_page.html")
+
+
+def fixture_sentences():
+    parser = ParagraphCollector(10 ** 9)
+    with open(FIXTURE, encoding="utf-8") as f:
+        parser.feed(f.read().replace("{company}", "Acme"))
+    parser.close()
+    return [sentence for paragraph in parser.paragraphs for sentence in re.split(r"(?<=\.) ", paragraph)]
+
+
+def page(rng, sentences, chars):
+    """One scraped page of about `chars` characters."""
+    parts = []
+    size = 0
+    while size < chars:
+        sentence = rng.choice(sentences)
+        if rng.random() < 0.3:
+            sentence = sentence.replace(" ", f" [{rng.randint(1, 40)}] ", 1)
+        if rng.random() < 0.2:
+            sentence = f"{rng.choice(UNWANTED_PHRASES)} {sentence}"
+        if rng.random() < 0.5:
+            # Mostly unique sentences, so the budget is what ends the sweep
+            sentence = sentence.rstrip(".") + f" in {rng.randint(1990, 2030)}."
+        parts.append(sentence + rng.choice([" ", "  ", "\n", " \t"]))
+        size += len(parts[-1])
+    return "".join(parts)
+
+
+def mirror(rng, text):
+    """A repost of `text` with a few words dropped or changed."""
+    words = text.split(" ")
+    return " ".join(
+        word if rng.random() > 0.04 else rng.choice(["", "the", word.upper()]) for word in words
+    )
+
+
+def corpora(seed=0):
+    rng = random.Random(seed)
+    sentences = fixture_sentences()
+    yield "5 pages x 1.5k", [page(rng, sentences, 1500) for _ in range(5)]
+    yield "5 pages x 20k", [page(rng, sentences, 20000) for _ in range(5)]
+    yield "20 pages x 50k", [page(rng, sentences, 50000) for _ in range(20)]
+    yield "5 pages x 1M", [page(rng, sentences, 1000000) for _ in range(5)]
+    pages = [page(rng, sentences, 20000) for _ in range(5)]
+    pages[0] = pages[0][:500] + " Privacy Policy " + pages[0][500:]
+    yield "early stop phrase", pages
+    original = page(rng, sentences, 1500)
+    yield "5 mirrors x 1.5k", [original] + [mirror(rng, original) for _ in range(4)]
+
+
+def legacy_clean(pages):
+    cleaned = []
+    for text in pages:
+        for phrase in UNWANTED_PHRASES:
+            text = text.replace(phrase, "")
+        cleaned.append(text)
+    return remove_duplicates(truncate_text(clean_irrelevant_content(" ".join(cleaned))))
+
+
+_exact_cleaner = TextCleaner(stop_phrases=(), near_duplicates=0)
+
+
+def exact_clean(pages):
+    return _exact_cleaner.clean(" ".join(truncate_at_stop_phrase(text) for text in pages))
+
+
+def single_pass_clean(pages):
+    return clean_scraped_text(" ".join(truncate_at_stop_phrase(text) for text in pages), truncated=True)
+
+
+def time_it(fn, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(pages)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    rows = []
+    for name, pages in corpora():
+        chars = sum(len(text) for text in pages)
+        repeat = max(args.repeat // 25, 1) if chars > 1000000 else args.repeat
+        legacy_time, legacy_text = time_it(legacy_clean, pages, repeat)
+        exact_time, exact_text = time_it(exact_clean, pages, repeat)
+        new_time, new_text = time_it(single_pass_clean, pages, repeat)
+        rows.append({
+            "corpus": name, "chars": chars,
+            "legacy_ms": legacy_time * 1000, "legacy_chars": len(legacy_text),
+            "exact_ms": exact_time * 1000, "exact_chars": len(exact_text),
+            "near_dup_ms": new_time * 1000, "near_dup_chars": len(new_text),
+            "exact_speedup": legacy_time / exact_time,
+            "near_dup_speedup": legacy_time / new_time,
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'corpus':<20}{'chars':>10}{'legacy ms':>12}{'out':>6}{'exact ms':>11}{'out':>6}{'speedup':>9}"
+          f"{'near-dup ms':>14}{'out':>6}{'speedup':>9}")
+    for row in rows:
+        print(f"{row['corpus']:<20}{row['chars']:>10}{row['legacy_ms']:>12.3f}{row['legacy_chars']:>6}"
+              f"{row['exact_ms']:>11.3f}{row['exact_chars']:>6}{row['exact_speedup']:>8.1f}x"
+              f"{row['near_dup_ms']:>14.3f}{row['near_dup_chars']:>6}{row['near_dup_speedup']:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark the upstream resilience layer against a faulty stub server.
+
+Compares a plain `requests.get` with `http_get` (timeouts, jittered retries,
+hedging after p95, circuit breakers) on a slow tail, a flaky upstream and a
+hung upstream, and reports latency percentiles and success rates.
+
+    python -m benchmarks.bench_resilience [--calls 500] [--concurrency 8] [--json]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from research_agent import http_client
+from research_agent.http_client import http_get
+
+from .stub_server import StubServer
+
+# Timeout for both clients, so a hung upstream costs the same per try
+TIMEOUT = (1, 1)
+
+SCENARIOS = {
+    "slow tail": {"latency": 0.01, "jitter": 0.005, "slow_rate": 0.05, "slow_latency": 0.5},
+    "flaky": {"latency": 0.01, "error_rate": 0.3},
+    "hung": {"hang_rate": 1.0, "hang_seconds": 3},
+}
+
+
+def plain_get(url):
+    return requests.get(url, timeout=TIMEOUT)
+
+
+def resilient_get(url):
+    return http_get(url, provider="stub", timeout=TIMEOUT)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def run(get, config, calls, concurrency):
+    def one(_):
+        started = time.perf_counter()
+        try:
+            ok = get(server.url + "/json").status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    # A fresh server (and port) per run, so no host state carries over
+    with StubServer(**config) as server:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(one, range(calls)))
+        wall = time.perf_counter() - started
+        upstream_requests = server.requests
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "calls": calls,
+        "success_rate": sum(ok for _, ok in results) / calls,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "last_10_mean_ms": sum(latencies[-10:]) / len(latencies[-10:]) * 1000,
+        "wall_s": wall,
+        "upstream_requests": upstream_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Let hedging start early in a short run
+    http_client.HTTP_HEDGE_MIN_SAMPLES = 10
+
+    rows = []
+    for name, config in SCENARIOS.items():
+        # A hung upstream is only worth a few calls for the plain client
+        calls = args.calls if name != "hung" else min(args.calls, 4 * args.concurrency)
+        for client, get in (("plain", plain_get), ("resilient", resilient_get)):
+            rows.append({"scenario": name, "client": client, **run(get, config, calls, args.concurrency)})
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'scenario':<12}{'client':<11}{'ok %':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'last10 ms':>11}{'wall s':>8}{'upstream':>10}")
+    for row in rows:
+        print(f"{row['scenario']:<12}{row['client']:<11}{row['success_rate'] * 100:>7.1f}{row['p50_ms']:>9.1f}"
+              f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['last_10_mean_ms']:>11.1f}{row['wall_s']:>8.2f}"
+              f"{row['upstream_requests']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark ingesting into and searching the local resource index.
+
+Builds a scratch index with `--entries` synthetic catalog entries per
+source (names and descriptions drawn from the recorded company page and
+use cases), then looks up the keywords of every recorded use case title in
+every source. Reports the ingest rate, lookup latency percentiles and the
+share of lookups the index answers, next to the median latency of the
+live source APIs that `fake_upstreams.py` models.
+
+    python -m benchmarks.bench_resource_index [--entries 100000] [--repeat 20] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+from research_agent.resource_index import RECORD_PARSERS, ResourceIndex
+from research_agent.resources_main import query_keywords
+from research_agent.usecase_main import parse_ai_usecases
+
+from .fake_upstreams import DEFAULT_LATENCIES, fixture
+
+# Live upstream each source's lookups would otherwise go to
+SOURCE_UPSTREAMS = {
+    "huggingface_models": "huggingface",
+    "huggingface_datasets": "huggingface",
+    "kaggle_datasets": "kaggle",
+    "github_repositories": "github",
+    "research_papers": "arxiv",
+}
+
+
+def vocabulary():
+    text = fixture("company_page.html") + " " + fixture("gemini_usecases.txt")
+    return sorted({word for word in re.findall(r"[a-z]{4,}", text.lower())})
+
+
+def records(source, count, words, rng):
+    """`count` catalog records for `source`, shaped like its upstream dump."""
+    for i in range(count):
+        title = " ".join(rng.sample(words, 3))
+        description = " ".join(rng.choices(words, k=25))
+        popularity = int(rng.paretovariate(1.2) * 10)
+        slug = f"user{i % 997}/{title.replace(' ', '-')}-{i}"
+        if source == "research_papers":
+            yield {"id": f"{2000 + i // 100000}.{i % 100000:05d}", "title": title.title(), "abstract": description}
+        elif source == "github_repositories":
+            yield {"full_name": slug, "description": description, "stargazers_count": popularity}
+        elif source == "kaggle_datasets":
+            yield {"ref": slug, "title": title.title(), "subtitle": description, "downloadCount": popularity}
+        else:
+            yield {"id": slug, "description": description, "tags": title.split(), "downloads": popularity}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000, help="catalog entries per source")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = vocabulary()
+    keyword_lists = [
+        query_keywords(use_case["title"])
+        for use_case in parse_ai_usecases(fixture("gemini_usecases.txt"))["use_cases"]
+    ]
+    scratch = tempfile.mkdtemp(prefix="research-index-")
+    try:
+        index = ResourceIndex(os.path.join(scratch, "resource_index.sqlite3"))
+        rows = []
+        for source in RECORD_PARSERS:
+            started = time.perf_counter()
+            count = index.ingest(source, records(source, args.entries, words, rng))
+            ingest = time.perf_counter() - started
+
+            latencies = []
+            hits = 0
+            for _ in range(args.repeat):
+                for keywords in keyword_lists:
+                    started = time.perf_counter()
+                    result = index.search(source, keywords)
+                    latencies.append(time.perf_counter() - started)
+                    hits += result is not None
+            rows.append({
+                "source": source, "entries": count,
+                "ingest_per_s": round(count / ingest),
+                "p50_ms": percentile(latencies, 0.50), "p95_ms": percentile(latencies, 0.95),
+                "hit_rate": hits / len(latencies),
+                "live_median_ms": DEFAULT_LATENCIES[SOURCE_UPSTREAMS[source]][0] * 1000,
+            })
+        size_mb = os.path.getsize(index.path) / 1024 / 1024
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"index_mb": round(size_mb, 1), "sources": rows}, indent=2))
+        return
+
+    print(f"{'source':<22}{'entries':>9}{'ingest/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'hits':>7}{'live ms':>9}")
+    for row in rows:
+        print(f"{row['source']:<22}{row['entries']:>9}{row['ingest_per_s']:>10}{row['p50_ms']:>9.2f}"
+              f"{row['p95_ms']:>9.2f}{row['hit_rate']:>7.0%}{row['live_median_ms']:>9.0f}")
+    print(f"index size: {size_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark the use-case parser against the previous DOTALL regex.
+
+Runs both parsers over the sample Gemini output embedded in usecase_main,
+fuzzed format variants of it, long outputs and a streamed (chunked) feed,
+and reports timings and how many use cases each parser recovered.
+
+    python -m benchmarks.bench_usecase_parser [--repeat 200] [--json]
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from research_agent.usecase_main import UseCaseParser, parse_ai_usecases, text as SAMPLE
+
+LEGACY_PATTERN = re.compile(
+    r"\*\s+\*\*(\d+)\.\s+(.+?):\*\*\n\s+\*\s+\*\*Explanation:\*\*\s+(.+?)\n\s+\*\s+\*\*Practical Application:\*\*\s+(.+?)(?=\n\n\*|$)",
+    re.DOTALL,
+)
+
+
+def legacy_parse(output):
+    return {"use_cases": [
+        {"title": title.strip(), "explanation": explanation.strip(),
+         "practical_application": [app.strip() for app in applications.split("\n") if app.strip()]}
+        for _, title, explanation, applications in LEGACY_PATTERN.findall(output)
+    ]}
+
+
+def variants(sample):
+    """Format drift we have seen (or expect) from the model."""
+    yield "sample", sample
+    yield "dash bullets", sample.replace("*   ", "-   ")
+    yield "plural label", sample.replace("Practical Application:", "Practical Applications:")
+    yield "crlf", sample.replace("\n", "\r\n")
+    yield "no blank lines", re.sub(r"\n\n+", "\n", sample)
+    yield "markdown headings", re.sub(r"\*   \*\*(\d+)\. (.+?):\*\*", r"### \1. \2", sample)
+    yield "plain labels", sample.replace("**Explanation:**", "Explanation:").replace(
+        "**Practical Application:**", "Practical Application:")
+    yield "bold after number", re.sub(r"\*   \*\*(\d+)\. (.+?):\*\*", r"\1. **\2**", sample)
+    yield "two-space indent", sample.replace("    *   ", "  * ")
+    yield "description label", sample.replace("Explanation:", "Description:")
+
+
+def fuzz(sample, seed):
+    """Random whitespace/bullet perturbations of the sample."""
+    rng = random.Random(seed)
+    lines = []
+    for line in sample.split("\n"):
+        line = line.replace("*   ", rng.choice(["*   ", "* ", "- ", "*\t"]), 1)
+        if rng.random() < 0.2:
+            line += " " * rng.randint(1, 3)
+        lines.append(line)
+        if rng.random() < 0.1:
+            lines.append("")
+    return "\n".join(lines)
+
+
+def long_output(sample, copies):
+    """A long response: the sample's use cases renumbered and repeated."""
+    blocks = re.split(r"\n\n(?=\*   \*\*\d+\.)", sample.split(":\n\n", 1)[1])
+    out, number = [], 0
+    for _ in range(copies):
+        for block in blocks:
+            number += 1
+            out.append(re.sub(r"\*\*\d+\.", f"**{number}.", block, count=1))
+    return "Intro:\n\n" + "\n\n".join(out)
+
+
+def unterminated(sample, size):
+    """Output cut off mid-use-case with a very long trailing paragraph."""
+    return sample.split("*   **5.")[0] + "*   **5. Truncated:**\n    *   **Explanation:** " + "word " * size
+
+
+def time_it(fn, arg, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(arg)
+    return (time.perf_counter() - started) / repeat, len(result["use_cases"])
+
+
+def streamed_parse(output, chunk_size=17):
+    parser = UseCaseParser()
+    for i in range(0, len(output), chunk_size):
+        parser.feed(output[i:i + chunk_size])
+    return {"use_cases": parser.close()}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    arg_parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = arg_parser.parse_args()
+
+    cases = list(variants(SAMPLE))
+    cases += [(f"fuzz #{seed}", fuzz(SAMPLE, seed)) for seed in range(5)]
+    cases += [("long x20", long_output(SAMPLE, 20)), ("unterminated 20k words", unterminated(SAMPLE, 20000))]
+
+    rows = []
+    for name, output in cases:
+        repeat = max(args.repeat // 20, 1) if len(output) > 50000 else args.repeat
+        legacy_time, legacy_count = time_it(legacy_parse, output, repeat)
+        new_time, new_count = time_it(parse_ai_usecases, output, repeat)
+        stream_time, stream_count = time_it(streamed_parse, output, repeat)
+        rows.append({
+            "case": name, "chars": len(output),
+            "legacy_ms": legacy_time * 1000, "legacy_use_cases": legacy_count,
+            "parser_ms": new_time * 1000, "parser_use_cases": new_count,
+            "streamed_ms": stream_time * 1000, "streamed_use_cases": stream_count,
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'case':<24}{'chars':>9}{'legacy ms':>11}{'#':>4}{'parser ms':>11}{'#':>4}{'streamed ms':>13}{'#':>4}")
+    for row in rows:
+        print(f"{row['case']:<24}{row['chars']:>9}{row['legacy_ms']:>11.3f}{row['legacy_use_cases']:>4}"
+              f"{row['parser_ms']:>11.3f}{row['parser_use_cases']:>4}"
+              f"{row['streamed_ms']:>13.3f}{row['streamed_use_cases']:>4}")
+
+
+if __name__ == "__main__":
+    main()
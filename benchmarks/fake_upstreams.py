@@ -0,0 +1,160 @@
+"""Local stand-ins for every upstream the pipeline calls.
+
+Each upstream (Google search, the scraped company pages, Hugging Face,
+GitHub, arXiv, Kaggle and Gemini) runs as its own StubServer so it gets
+its own latency distribution. They replay the recorded responses in
+`fixtures/`; the fake Gemini answers generateContent and
+streamGenerateContent with the recorded overview / use cases (or the fused
+JSON when a response schema is requested).
+
+`start_upstreams()` returns the running servers and the environment
+variables that point the app at them.
+"""
+import json
+import os
+import re
+
+from .stub_server import StubServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Median latency (seconds) and lognormal sigma per upstream, roughly what we
+# see from the real services
+DEFAULT_LATENCIES = {
+    "google": (0.25, 0.3),
+    "pages": (0.15, 0.5),
+    "huggingface": (0.2, 0.4),
+    "github": (0.3, 0.4),
+    "arxiv": (0.5, 0.5),
+    "kaggle": (0.35, 0.4),
+    "gemini": (1.0, 0.3),
+}
+# Delay between streamed Gemini chunks, and characters per chunk
+GEMINI_CHUNK_DELAY = 0.03
+GEMINI_CHUNK_SIZE = 120
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _company_from_query(request):
+    match = re.search(r"[?&]q=([^&]*)", request.path)
+    return match.group(1) if match else "company"
+
+
+def google_routes(pages_url):
+    def search(request):
+        slug = _company_from_query(request)
+        request.send_json({"items": [{"link": f"{pages_url}/{slug}/{i}"} for i in range(5)]})
+    return {"/customsearch/v1": search}
+
+
+def pages_routes():
+    page = fixture("company_page.html")
+
+    def company_page(request):
+        company = request.path.split("/")[1].replace("+", " ").replace("%20", " ") or "Acme"
+        request.send_body(200, page.replace("{company}", company).encode("utf-8"), "text/html; charset=utf-8")
+    return {"*": company_page}
+
+
+def json_routes(routes):
+    """Routes that replay a recorded JSON fixture."""
+    def replay(body):
+        return lambda request: request.send_body(200, body, "application/json")
+    return {path: replay(fixture(name).encode("utf-8")) for path, name in routes.items()}
+
+
+def arxiv_routes():
+    feed = fixture("arxiv.xml").encode("utf-8")
+    return {"/api/query": lambda request: request.send_body(200, feed, "application/atom+xml; charset=utf-8")}
+
+
+def gemini_routes(chunk_delay=GEMINI_CHUNK_DELAY):
+    overview = fixture("gemini_overview.txt")
+    usecases = fixture("gemini_usecases.txt")
+
+    def fused_json():
+        # Imported lazily so the stand-ins can start without Django settings
+        from research_agent.usecase_main import parse_ai_usecases
+
+        return json.dumps({"overview": overview, "use_cases": parse_ai_usecases(usecases)["use_cases"]})
+
+    def generate(request):
+        body = json.loads(request.body or b"{}")
+        prompt = " ".join(
+            part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+        )
+        if "responseMimeType" in json.dumps(body.get("generationConfig", {})):
+            text = fused_json()
+        elif "use cases" in prompt:
+            text = usecases
+        else:
+            text = overview
+
+        def response(chunk):
+            return {
+                "candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(chunk) // 4},
+            }
+
+        if ":streamGenerateContent" in request.path:
+            chunks = [text[i:i + GEMINI_CHUNK_SIZE] for i in range(0, len(text), GEMINI_CHUNK_SIZE)]
+            request.send_chunks(
+                (f"data: {json.dumps(response(chunk))}\r\n\r\n".encode("utf-8") for chunk in chunks),
+                "text/event-stream", delay=chunk_delay,
+            )
+        else:
+            request.send_json(response(text))
+    return {"*": generate}
+
+
+def start_upstreams(latencies=None, error_rate=0.0):
+    """Start every stand-in and return (servers by name, env pointing the app at them).
+
+    `latencies` maps upstream names to (median seconds, lognormal sigma),
+    overriding DEFAULT_LATENCIES.
+    """
+    latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+
+    def server(name, routes):
+        median, sigma = latencies[name]
+        return StubServer(routes=routes, latency=median, latency_sigma=sigma, error_rate=error_rate).start()
+
+    servers = {"pages": server("pages", pages_routes())}
+    servers["google"] = server("google", google_routes(servers["pages"].url))
+    servers["huggingface"] = server("huggingface", json_routes({
+        "/api/models": "huggingface_models.json",
+        "/api/datasets": "huggingface_datasets.json",
+    }))
+    servers["github"] = server("github", json_routes({"/search/repositories": "github_search.json"}))
+    servers["arxiv"] = server("arxiv", arxiv_routes())
+    servers["kaggle"] = server("kaggle", json_routes({"/api/v1/datasets/list": "kaggle_datasets.json"}))
+    servers["gemini"] = server("gemini", gemini_routes())
+
+    env = {
+        "GOOGLE_SEARCH_URL": servers["google"].url + "/customsearch/v1",
+        "GOOGLE_SEARCH_API": "benchmark",
+        "HUGGINGFACE_API_URL": servers["huggingface"].url + "/api",
+        "GITHUB_API_URL": servers["github"].url,
+        "ARXIV_API_URL": servers["arxiv"].url + "/api/query",
+        # The Kaggle SDK can't be pointed at another endpoint, only at
+        # http://localhost; proxy that to the stand-in. Every other stand-in
+        # is addressed as 127.0.0.1 and bypasses the proxy. (This mode also
+        # makes the SDK print every call to stdout.)
+        "KAGGLE_API_ENVIRONMENT": "LOCALHOST",
+        "HTTP_PROXY": servers["kaggle"].url,
+        "NO_PROXY": "127.0.0.1",
+        "KAGGLE_USERNAME": "benchmark",
+        "KAGGLE_KEY": "benchmark",
+        "GEMINI_BASE_URL": servers["gemini"].url,
+        "GEMINI_API_KEY": "benchmark",
+    }
+    return servers, env
+
+
+def stop_upstreams(servers):
+    for server in servers.values():
+        server.stop()
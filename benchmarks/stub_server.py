@@ -0,0 +1,170 @@
+"""Local HTTP stub upstream that injects latency and errors.
+
+Every request is answered after `latency` seconds (plus up to `jitter`, or
+times a lognormal factor with `latency_sigma`); a `slow_rate` fraction of
+them take `slow_latency` instead, an `error_rate` fraction get
+`error_status`, and a `hang_rate` fraction never answer before the client
+gives up. Paths:
+
+    /json               {"ok": true, "path": ...}
+    /status/<code>      an empty response with that status
+    /delay/<seconds>    /json after an extra delay
+
+Run standalone, or start in-process from a benchmark with StubServer:
+
+    python -m benchmarks.stub_server --port 8900 --latency 0.02 --error-rate 0.2
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't let Nagle delay the body
+    # on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.body = b""
+        self.handle_request()
+
+    def do_POST(self):
+        self.body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.handle_request()
+
+    def handle_request(self):
+        config = self.server.config
+        self.server.requests += 1
+        path = urlsplit(self.path).path
+
+        if random.random() < config["hang_rate"]:
+            time.sleep(config["hang_seconds"])
+            self.close_connection = True
+            return
+        if random.random() < config["slow_rate"]:
+            time.sleep(config["slow_latency"])
+        elif config["latency_sigma"]:
+            time.sleep(config["latency"] * random.lognormvariate(0, config["latency_sigma"]))
+        else:
+            time.sleep(config["latency"] + random.uniform(0, config["jitter"]))
+        if random.random() < config["error_rate"]:
+            return self.send_body(config["error_status"], b"")
+
+        if path.startswith("/status/"):
+            return self.send_body(int(path.rsplit("/", 1)[1]), b"")
+        if path.startswith("/delay/"):
+            time.sleep(float(path.rsplit("/", 1)[1]))
+        handler = self.server.routes.get(path) or self.server.routes.get("*")
+        if handler is not None:
+            return handler(self)
+        self.send_json({"ok": True, "path": self.path})
+
+    def send_json(self, data, status=200):
+        self.send_body(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def send_body(self, status, body, content_type="text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunks(self, chunks, content_type="text/plain", delay=0.0):
+        """Stream `chunks` (bytes) with chunked encoding, `delay` seconds apart."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay)
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StubServer:
+    """A stub upstream on a background thread; change `config` while it runs.
+
+    `routes` maps extra paths (or "*" for any other path) to
+    `handler(request)` callables, which can read `request.path` and
+    `request.body` and answer through `request.send_json(...)`,
+    `request.send_body(...)` or `request.send_chunks(...)`.
+    """
+
+    DEFAULTS = {
+        "latency": 0.0,
+        "jitter": 0.0,
+        "latency_sigma": 0.0,
+        "slow_rate": 0.0,
+        "slow_latency": 1.0,
+        "error_rate": 0.0,
+        "error_status": 503,
+        "hang_rate": 0.0,
+        "hang_seconds": 30.0,
+    }
+
+    def __init__(self, port=0, routes=None, **config):
+        self.httpd = _Server(("127.0.0.1", port), StubHandler)
+        self.httpd.config = {**self.DEFAULTS, **config}
+        self.httpd.routes = routes or {}
+        self.httpd.requests = 0
+        self._thread = None
+
+    @property
+    def config(self):
+        return self.httpd.config
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    for name, default in StubServer.DEFAULTS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=default)
+    args = vars(parser.parse_args())
+    server = StubServer(**args)
+    print(f"Stub upstream listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
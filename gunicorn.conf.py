@@ -0,0 +1,31 @@
+"""Production serving: gunicorn managing uvicorn workers running main.asgi.
+
+    gunicorn main.asgi:application -c gunicorn.conf.py
+
+Every setting can be tuned through the environment.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Each worker is a process with its own event loop, research pool and
+# in-process caches; rate limits, caches on disk and single-flight locks are
+# shared between them
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2, 8)))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# A research run can take minutes; a worker whose event loop is blocked this
+# long is restarted
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 300))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 60))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then to bound memory growth; the jitter keeps them
+# from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
 import os
+import time
+
+_started = time.perf_counter()
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
 
 application = get_asgi_application()
+
+from research_agent.clients import record_startup_timing  # noqa: E402
+
+record_startup_timing("application", time.perf_counter() - _started)
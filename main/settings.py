@@ -17,7 +17,7 @@ import os
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Define log file path
-LOG_FILE_PATH = BASE_DIR / "endpoint.log"
+LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", BASE_DIR / "endpoint.log")
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -90,7 +90,12 @@ WSGI_APPLICATION = 'main.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Job workers write from several threads/processes; wait for locks
+        # instead of failing with "database is locked"
+        'OPTIONS': {
+            'timeout': 20,
+        },
     }
 }
 
@@ -151,6 +156,11 @@ LOGGING = {
         "simple": {
             "format": "%(levelname)s: %(message)s",
         },
+        # One JSON object per line; slow-call messages are JSON themselves
+        "structured": {
+            "format": '{"time": "%(asctime)s", "level": "%(levelname)s", "logger": "%(name)s", "call": %(message)s}',
+            "datefmt": "%Y-%m-%dT%H:%M:%S%z",
+        },
     },
     "handlers": {
         "file": {
@@ -164,6 +174,12 @@ LOGGING = {
             "class": "logging.StreamHandler",
             "formatter": "simple",
         },
+        "slow_calls": {
+            "level": "WARNING",
+            "class": "logging.FileHandler",
+            "filename": LOG_FILE_PATH,
+            "formatter": "structured",
+        },
     },
     "loggers": {
         "django": {
@@ -176,5 +192,11 @@ LOGGING = {
             "level": "ERROR",
             "propagate": False,
         },
+        # Stages and outbound calls over SLOW_STAGE_SECONDS / SLOW_CALL_SECONDS
+        "research_agent.slow": {
+            "handlers": ["slow_calls", "console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
     },
 }
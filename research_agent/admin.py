@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ResearchJob, ResearchResult
+
+
+@admin.register(ResearchJob)
+class ResearchJobAdmin(admin.ModelAdmin):
+    list_display = ("query", "status", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("query",)
+
+
+@admin.register(ResearchResult)
+class ResearchResultAdmin(admin.ModelAdmin):
+    list_display = ("company", "created_at")
+    search_fields = ("company",)
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .models import normalize_company
+from .pdf_generator import create_combined_pdf
+from .rate_limit import patient
+from .reports import REPORTS_DIR, open_pdf, run_in_render_pool
+from .resources_main import LookupMemo
+from .singleflight import research_once
+from .tracing import in_context
+
+logger = logging.getLogger(__name__)
+
+# Company runs executing at once in this process, across every batch; a
+# batch's remaining companies queue for these slots
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 8))
+# Most companies one batch may ask for
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", 500))
+# How long (seconds) a batch run's upstream calls may wait for their
+# provider's rate limit before being shed. Nobody is watching a page load, so
+# waiting beats failing the company. Their resource lookups run on separate
+# pools and get this much longer before they time out.
+BATCH_RATE_LIMIT_MAX_WAIT = float(os.getenv("BATCH_RATE_LIMIT_MAX_WAIT", 120))
+
+# PDF bundles of a batch: "zip" holds one PDF per company, "combined" is a
+# single PDF with every report
+BUNDLE_FORMATS = {"zip": "zip", "combined": "pdf"}
+# A bundle being built is marked by a file next to it, so every worker
+# process can tell "not ready yet" from "unknown". Markers older than this
+# (seconds) were left by a build that died.
+BUNDLE_BUILD_TIMEOUT = 600
+
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+_BUNDLE_RE = re.compile(r"^batch-[0-9a-f]{64}\.(pdf|zip)$")
+
+
+def _research(company_name, lookups):
+    with patient(BATCH_RATE_LIMIT_MAX_WAIT):
+        return research_once(company_name, shared_lookups=lookups)
+
+
+class Batch:
+    """Research runs for a list of companies, sharing their resource lookups.
+
+    Companies repeated in the list (compared case- and whitespace-
+    insensitively) run once. Runs go to the process-wide batch pool, at most
+    `concurrency` of this batch's at a time, and `iter_completed` yields
+    them as they finish.
+    """
+
+    def __init__(self, queries, concurrency=None):
+        self.queries = queries
+        self.concurrency = max(1, min(concurrency or BATCH_WORKERS, BATCH_WORKERS))
+        self.lookups = LookupMemo()
+        self._positions = {}
+        for index, query in enumerate(queries):
+            self._positions.setdefault(normalize_company(query), []).append(index)
+
+    @property
+    def company_count(self):
+        """Distinct companies in the batch."""
+        return len(self._positions)
+
+    def iter_completed(self):
+        """Yield (index, query, ResearchResult or exception) for every query, in
+        completion order. Closing the iterator cancels the runs not yet started."""
+        running = self._start()
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                yield from self._completed(running, done)
+        finally:
+            self._cancel(running)
+
+    async def aiter_completed(self):
+        """`iter_completed` for the event loop: waiting for the runs holds no thread."""
+        running = self._start()
+        waiters = {}
+        try:
+            while running:
+                for future in running.keys() - waiters.keys():
+                    waiters[future] = asyncio.wrap_future(future)
+                await asyncio.wait(waiters.values(), return_when=asyncio.FIRST_COMPLETED)
+                done = [future for future in running if future.done()]
+                for future in done:
+                    del waiters[future]
+                for item in self._completed(running, done):
+                    yield item
+        finally:
+            self._cancel(running)
+
+    def _start(self):
+        """Submit the first `concurrency` runs and return the running ones."""
+        self._waiting = iter(self._positions.values())
+        running = {}
+        for _ in range(self.concurrency):
+            self._submit_next(running)
+        return running
+
+    def _submit_next(self, running):
+        indexes = next(self._waiting, None)
+        if indexes is not None:
+            future = _batch_executor.submit(in_context(_research), self.queries[indexes[0]], self.lookups)
+            running[future] = indexes
+
+    def _completed(self, running, done):
+        """Yield the outcomes of the `done` runs, starting the next ones."""
+        for future in done:
+            indexes = running.pop(future)
+            self._submit_next(running)
+            try:
+                outcome = future.result()
+            except Exception as e:
+                logger.warning("Batch research for %s failed: %s", self.queries[indexes[0]], e)
+                outcome = e
+            for index in indexes:
+                yield index, self.queries[index], outcome
+
+    def _cancel(self, running):
+        for future in running:
+            future.cancel()
+
+
+def bundle_path(name):
+    """Path of a stored bundle, or None if `name` is not a bundle name."""
+    if not _BUNDLE_RE.match(name):
+        return None
+    return os.path.join(REPORTS_DIR, name)
+
+
+def _file_name(position, company):
+    return f"{position:03d}_{re.sub(r'[^A-Za-z0-9]+', '_', company).strip('_') or 'Company'}_Research_Report.pdf"
+
+
+def bundle_name(results, bundle_format):
+    """Name of the bundle of `results` (ResearchResults, in batch order).
+
+    Bundles are named after the reports they hold, so asking for the same
+    bundle again reuses the file.
+    """
+    digest = hashlib.sha256(
+        "\0".join([bundle_format, *(result.payload_hash for result in results)]).encode("utf-8")
+    ).hexdigest()
+    return f"batch-{digest}.{BUNDLE_FORMATS[bundle_format]}"
+
+
+def _pending_marker(path):
+    return f"{path}.pending"
+
+
+def bundle_pending(name):
+    """Whether the bundle `name` is still being built."""
+    path = bundle_path(name)
+    if path is None:
+        return False
+    try:
+        return time.time() - os.path.getmtime(_pending_marker(path)) < BUNDLE_BUILD_TIMEOUT
+    except FileNotFoundError:
+        return False
+
+
+def build_bundle(results, bundle_format):
+    """Bundle the PDFs of `results` and return the bundle's file name under
+    REPORTS_DIR. Bundles share the PDF cache directory and its
+    PDF_CACHE_MAX_FILES limit.
+    """
+    name = bundle_name(results, bundle_format)
+    path = bundle_path(name)
+    if os.path.exists(path):
+        return name
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if bundle_format == "combined":
+            create_combined_pdf([(result.company, result.payload) for result in results], tmp_path)
+        else:
+            # PDFs are compressed already; most were rendered when stored
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as bundle:
+                for position, result in enumerate(results, 1):
+                    with open_pdf(result.payload_hash, result.payload) as pdf:
+                        bundle.writestr(_file_name(position, result.company), pdf.read())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return name
+
+
+def start_bundle(results, bundle_format):
+    """Like `build_bundle`, but return the name at once and build the bundle
+    on the PDF render pool; `bundle_pending` is true for it until then."""
+    name = bundle_name(results, bundle_format)
+    path = bundle_path(name)
+    if not os.path.exists(path):
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        marker = _pending_marker(path)
+        open(marker, "w").close()
+        run_in_render_pool(_build_marked, results, bundle_format, marker)
+    return name
+
+
+def _build_marked(results, bundle_format, marker):
+    try:
+        build_bundle(results, bundle_format)
+    finally:
+        # Only after the bundle is in place (or the build failed)
+        try:
+            os.remove(marker)
+        except FileNotFoundError:
+            pass
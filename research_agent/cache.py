@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Local cache stores live next to the project unless told otherwise
+CACHE_DIR = os.getenv(
+    "RESEARCH_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
+
+
+class SQLiteCache:
+    """Small persistent key/value cache backed by a SQLite file.
+
+    Entries expire after `ttl` seconds and the store is kept under
+    `max_entries` (and optionally `max_bytes`) by evicting the least recently
+    used entries. With `keep_stale`, expired entries are kept (until evicted)
+    so callers can revalidate them with `get_entry`. Because the data and the
+    hit/miss counters live in SQLite, the cache survives restarts and is
+    shared by every worker process that points at the same file.
+    """
+
+    def __init__(self, name, ttl, max_entries=None, max_bytes=None, keep_stale=False, path=None):
+        self.name = name
+        self.ttl = ttl
+        self.keep_stale = keep_stale
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path or os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def count(self, counter):
+        """Bump a named counter shared by every process using this cache."""
+        self._count(self._connect(), counter)
+
+    def _count(self, conn, counter):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (counter,),
+        )
+
+    def get_entry(self, key):
+        """Return (value, stored_at) for `key` even if expired, or None.
+
+        Unlike `get`, this does not touch the hit/miss counters.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return (row[0], row[1])
+
+    def get(self, key):
+        """Return the cached value for `key`, or None when missing or expired."""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM entries WHERE key = ? AND stored_at >= ?", (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            self._count(conn, "misses")
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        self._count(conn, "hits")
+        return row[0]
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, stored_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now, now),
+        )
+        self._evict(conn)
+
+    def touch(self, key):
+        """Mark an existing entry as freshly stored (e.g. after revalidation)."""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?", (now, now, key)
+        )
+
+    def _evict(self, conn):
+        if not self.keep_stale:
+            conn.execute("DELETE FROM entries WHERE stored_at < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_access DESC) AS total"
+                " FROM entries) WHERE total > ?)",
+                (self.max_bytes,),
+            )
+
+    def stats(self):
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "hits": 0,
+            "misses": 0,
+            **counters,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM counters")
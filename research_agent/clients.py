@@ -0,0 +1,75 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent importing and initialising each SDK client (and loading the
+# application), recorded the first time each one is created in this process
+STARTUP_TIMINGS = {}
+
+_clients = {}
+_clients_pid = None
+_lock = threading.Lock()
+
+
+def _create_genai_client():
+    from google import genai
+
+    # GEMINI_BASE_URL points the client at another endpoint, e.g. the local
+    # stand-in used by the benchmarks
+    base_url = os.getenv("GEMINI_BASE_URL")
+    http_options = {"base_url": base_url} if base_url else None
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=http_options)
+
+
+def _create_kaggle_api():
+    # Importing the kaggle package authenticates as a side effect, which is
+    # why it must never happen at module load
+    from kaggle.api.kaggle_api_extended import KaggleApi
+
+    api = KaggleApi()
+    api.authenticate()
+    return api
+
+
+CLIENT_FACTORIES = {
+    "genai": _create_genai_client,
+    "kaggle": _create_kaggle_api,
+}
+
+
+def get_client(name):
+    """Return the shared SDK client `name`, creating it on first use.
+
+    Clients are created once per process (again after a fork). A failed
+    creation is not cached, so e.g. adding Kaggle credentials later works
+    without a restart.
+    """
+    global _clients_pid
+    if _clients_pid == os.getpid() and name in _clients:
+        return _clients[name]
+
+    with _lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        if name not in _clients:
+            started = time.perf_counter()
+            _clients[name] = CLIENT_FACTORIES[name]()
+            record_startup_timing(name, time.perf_counter() - started)
+        return _clients[name]
+
+
+def get_genai_client():
+    return get_client("genai")
+
+
+def get_kaggle_api():
+    return get_client("kaggle")
+
+
+def record_startup_timing(name, seconds):
+    STARTUP_TIMINGS[name] = round(seconds, 4)
+    logger.info("Initialised %s in %.3fs", name, seconds)
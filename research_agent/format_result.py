@@ -1,4 +1,7 @@
+import math
+import os
 import re
+import string
 
 def remove_duplicates(text):
     """Remove duplicate paragraphs by normalizing spaces and removing repeats."""
@@ -18,9 +21,246 @@ def clean_text(text):
     """Remove citation numbers like [4], [5]"""
     return re.sub(r"\[\d+\]", "", text)
 
+# Sections that end the useful part of scraped text (everything after the
+# first one is dropped) and boilerplate removed wherever it appears
+STOP_PHRASES = ["Newsletter", "Privacy Policy", "Terms of Service", "Sign In", "Founder first", "Start your day"]
+UNWANTED_PHRASES = [
+    "Read more", "Learn more", "Click here", "Subscribe", "Sign up",
+    "Follow us", "Contact us", "Get started", "All rights reserved"
+]
+
 def clean_irrelevant_content(text):
     """Remove irrelevant sections like newsletter & policy text."""
-    stop_phrases = ["Newsletter", "Privacy Policy", "Terms of Service", "Sign In", "Founder first", "Start your day"]
-    for phrase in stop_phrases:
+    for phrase in STOP_PHRASES:
         text = text.split(phrase)[0]  
-    return text.strip()
\ No newline at end of file
+    return text.strip()
+
+
+# Jaccard similarity of word shingles above which a sentence, or a whole
+# scraped page, counts as a reworded copy of one already kept (0 disables).
+# Sentences differing in a single word ("70 cities" / "70 countries") stay
+# under the sentence threshold unless they are long.
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.8))
+DOCUMENT_DUPLICATE_THRESHOLD = float(os.getenv("DOCUMENT_DUPLICATE_THRESHOLD", 0.5))
+# Sentences with fewer words than this are never near-duplicates: rewording
+# a short sentence almost always changes what it says
+NEAR_DUPLICATE_MIN_WORDS = int(os.getenv("NEAR_DUPLICATE_MIN_WORDS", 8))
+
+_PUNCTUATION = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+
+def words_of(text):
+    """Lowercased words of `text`, split on whitespace and punctuation."""
+    return text.lower().translate(_PUNCTUATION).split()
+
+
+def shingles(words, size):
+    """The set of `size`-word shingles (word tuples) of `words`."""
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return set(zip(*(words[i:] for i in range(size))))
+
+
+class NearDuplicateIndex:
+    """Shingle sets of the texts kept so far, with an inverted index from
+    shingle to text, so a new text is only compared with those it shares
+    shingles with.
+
+    Only a prefix of each set goes into the index ("prefix filtering"): with
+    shingles in sorted order, two sets at least `threshold` similar always
+    share one of their first `len - ceil(threshold * len) + 1`. A new text
+    looks up just its own prefix, and is only scored against the texts
+    found there.
+
+    A text that mentions a number the kept one doesn't ("founded in 2009"
+    against "founded in 2010") carries a new fact and is never a duplicate,
+    and neither is one shorter than `min_words` words.
+    """
+
+    def __init__(self, threshold, shingle_size, min_words=0):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self._sets = []
+        self._numbers = []
+        self._postings = {}
+
+    def add_if_novel(self, text):
+        """Add `text` and return True, unless it is a near-duplicate of a kept text."""
+        if self.min_words and len(text.split()) < self.min_words:
+            return True
+        words = words_of(text)
+        current = shingles(words, self.shingle_size)
+        if not current:
+            return True
+        numbers = set(filter(str.isdigit, words))
+        postings = self._postings
+        size = len(current)
+        prefix = sorted(current)[:size - math.ceil(self.threshold * size) + 1]
+        for i in {i for shingle in prefix for i in postings.get(shingle, ())}:
+            kept = self._sets[i]
+            # Cheap rejections first: a new number, or sizes too far apart
+            if not numbers <= self._numbers[i] or not self.threshold * len(kept) <= size <= len(kept) / self.threshold:
+                continue
+            common = len(current & kept)
+            if common / (size + len(kept) - common) >= self.threshold:
+                return False
+        index = len(self._sets)
+        self._sets.append(current)
+        self._numbers.append(numbers)
+        for shingle in prefix:
+            postings.setdefault(shingle, []).append(index)
+        return True
+
+
+def drop_near_duplicate_documents(texts, threshold=DOCUMENT_DUPLICATE_THRESHOLD, sample_chars=1000):
+    """`texts` without those that are near-duplicates of an earlier one (mirrors, reposts).
+
+    Only the first `sample_chars` of each text are compared, which is enough
+    to recognise a copy.
+    """
+    if not threshold:
+        return list(texts)
+    index = NearDuplicateIndex(threshold, shingle_size=5)
+    return [text for text in texts if index.add_if_novel(text[:sample_chars])]
+
+
+class TextCleaner:
+    """The cleaning steps above, compiled into one regex and applied in one sweep.
+
+    `clean` walks the text once, from sentence to sentence: it stops at the
+    first stop phrase, drops unwanted phrases and citation marks, collapses
+    whitespace, skips sentences it has already kept (or, with
+    `near_duplicates`, reworded versions of them) and stops as soon as the
+    next sentence would go over `limit`, so text past the budget is never
+    scanned. Sentences are split on ". " like `remove_duplicates`, and at
+    line breaks, which separate paragraphs.
+
+    `truncate` is the stop phrase step on its own, for text that is cut
+    before it is cleaned.
+
+    The near-duplicate check costs roughly 10us per sentence read, which is
+    most of the work on a small scrape: there, cleaning takes about three
+    times as long as the chained functions did (still under a millisecond),
+    while on larger ones it is faster. With `near_duplicates=0` (or
+    NEAR_DUPLICATE_THRESHOLD=0) small scrapes clean as fast as before. See
+    benchmarks/bench_format_result.py.
+    """
+
+    def __init__(self, stop_phrases=STOP_PHRASES, unwanted_phrases=UNWANTED_PHRASES, strip_citations=True,
+                 near_duplicates=NEAR_DUPLICATE_THRESHOLD):
+        self.stop_phrases = frozenset(stop_phrases)
+        self.stop_pattern = re.compile("|".join(map(re.escape, stop_phrases))) if stop_phrases else None
+        self.near_duplicates = near_duplicates
+        alternatives = [re.escape(phrase) for phrase in [*stop_phrases, *unwanted_phrases]]
+        if strip_citations:
+            alternatives.append(r"\[\d+\]")
+        # A sentence end, and whitespace other than a single space (a line
+        # break also ends a sentence). Every alternative starts with a literal
+        # character, which lets `re` skip ahead to candidate positions
+        # instead of trying each one
+        alternatives.append(r"\.\s+")
+        alternatives += [re.escape(char) + (r"\s+" if char == " " else r"\s*") for char in " \t\n\r\f\v"]
+        self.pattern = re.compile("|".join(alternatives))
+
+    def truncate(self, text):
+        """`text` up to its first stop phrase."""
+        match = self.stop_pattern.search(text) if self.stop_pattern else None
+        return text[:match.start()] if match else text
+
+    def clean(self, text, limit=3000):
+        kept = []          # unique sentences, without their ". " separator
+        seen = set()
+        similar = (
+            NearDuplicateIndex(self.near_duplicates, shingle_size=2, min_words=NEAR_DUPLICATE_MIN_WORDS)
+            if self.near_duplicates else None
+        )
+        used = 0           # length of ". ".join(kept), plus a closing period
+        current = []       # pieces of the sentence being read
+        current_len = 0
+        cut = False        # stopped because the budget is full
+        closed = False     # the last sentence kept ended with a period
+
+        def finish(ended):
+            """Keep the sentence just read, unless it is a repeat or over the budget.
+            `ended` says whether a sentence end (rather than the text) closed it."""
+            nonlocal used, current_len, cut, closed
+            sentence = "".join(current).strip()
+            current.clear()
+            current_len = 0
+            if not sentence or sentence in seen:
+                return
+            if similar is not None and not similar.add_if_novel(sentence):
+                return
+            cost = len(sentence) + (2 if kept else 1)
+            if used + cost > limit:
+                cut = True
+                if not kept:
+                    # Not one sentence fits: cut the first one short, like `truncate_text`
+                    kept.append(sentence[:limit])
+                return
+            seen.add(sentence)
+            kept.append(sentence)
+            used += cost
+            closed = ended
+
+        def append(piece):
+            nonlocal current_len
+            # Collapse the spaces left on both sides of a removed phrase
+            if piece[:1] == " " and (not current or current[-1][-1:] == " "):
+                piece = piece[1:]
+            if piece:
+                current.append(piece)
+                current_len += len(piece)
+
+        position = 0
+        for match in self.pattern.finditer(text):
+            append(text[position:match.start()])
+            position = match.end()
+            token = match.group()
+            if token[0] == "." or "\n" in token:
+                finish(True)
+                if cut:
+                    break
+            elif token[0].isspace():
+                append(" ")
+            elif token in self.stop_phrases:
+                break
+            # The sentence being read can no longer fit; don't read the rest of it
+            if used + current_len > limit:
+                finish(False)
+                cut = True
+                break
+        else:
+            append(text[position:])
+
+        if not cut:
+            finish(False)
+        elif len(kept) == 1 and len(kept[0]) == limit:
+            # The first sentence was cut short; there is no period to keep
+            return kept[0]
+        result = ". ".join(kept)
+        # A cut keeps the period ending the last sentence, like `truncate_text`
+        if (cut or closed) and not result.endswith("."):
+            result += "."
+        return result
+
+
+_default_cleaner = TextCleaner()
+_truncated_cleaner = TextCleaner(stop_phrases=())
+
+
+def truncate_at_stop_phrase(text):
+    """`text` up to its first stop phrase, like `clean_irrelevant_content` but
+    in one scan and without stripping."""
+    return _default_cleaner.truncate(text)
+
+
+def clean_scraped_text(text, limit=3000, truncated=False):
+    """Stop phrases, unwanted phrases, citations, whitespace, duplicate sentences
+    and the `limit` budget in a single pass.
+
+    With `truncated`, `text` is made of pieces already cut at their stop
+    phrase by `truncate_at_stop_phrase`, so stop phrases are not looked for again.
+    """
+    return (_truncated_cleaner if truncated else _default_cleaner).clean(text, limit)
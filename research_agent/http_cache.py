@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .cache import SQLiteCache
+from .http_client import http_get
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+# How long (seconds) a response from each source is served without asking the
+# upstream again. Override per source with e.g. HTTP_CACHE_TTL_GITHUB=600.
+SOURCE_TTLS = {
+    "google_search": int(os.getenv("HTTP_CACHE_TTL_GOOGLE_SEARCH", 24 * 3600)),
+    "huggingface": int(os.getenv("HTTP_CACHE_TTL_HUGGINGFACE", 6 * 3600)),
+    "github": int(os.getenv("HTTP_CACHE_TTL_GITHUB", 6 * 3600)),
+    "arxiv": int(os.getenv("HTTP_CACHE_TTL_ARXIV", 24 * 3600)),
+}
+DEFAULT_TTL = int(os.getenv("HTTP_CACHE_TTL_DEFAULT", 3600))
+
+# Stale entries are kept (within the byte budget) so they can be revalidated
+# with If-None-Match / If-Modified-Since instead of being downloaded again.
+http_cache = SQLiteCache(
+    "http_responses",
+    ttl=max([DEFAULT_TTL, *SOURCE_TTLS.values()]),
+    max_bytes=HTTP_CACHE_MAX_BYTES,
+    keep_stale=True,
+)
+
+# The stored body is already decoded, so these no longer describe it
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def _cache_key(url, headers):
+    header_part = json.dumps(sorted((headers or {}).items()))
+    return hashlib.sha256(f"GET\0{url}\0{header_part}".encode("utf-8")).hexdigest()
+
+
+def _serialize(response):
+    meta = {
+        "status": response.status_code,
+        "reason": response.reason,
+        "url": response.url,
+        "encoding": response.encoding,
+        "headers": {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in _DROPPED_HEADERS
+        },
+    }
+    return json.dumps(meta).encode("utf-8") + b"\n" + response.content
+
+
+def _deserialize(value):
+    meta, body = value.split(b"\n", 1)
+    meta = json.loads(meta)
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response.reason = meta["reason"]
+    response.url = meta["url"]
+    response.encoding = meta["encoding"]
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response._content = body
+    response.from_cache = True
+    return response
+
+
+def _is_cacheable(response):
+    cache_control = response.headers.get("Cache-Control", "").lower()
+    return response.status_code == 200 and "no-store" not in cache_control
+
+
+def cached_get(source, url, params=None, headers=None, timeout=None):
+    """GET `url` through the shared on-disk HTTP cache.
+
+    Fresh entries (younger than the source's TTL) are returned without any
+    network traffic. Stale entries are revalidated with their ETag or
+    Last-Modified validators, so an unchanged upstream only costs a 304.
+    Requests that do reach the network count against `source`'s rate limit.
+    Returns a `requests.Response`; cached ones have `from_cache` set.
+    """
+    url = requests.Request("GET", url, params=params).prepare().url
+    if not HTTP_CACHE_ENABLED:
+        return http_get(url, provider=source, headers=headers, timeout=timeout)
+
+    key = _cache_key(url, headers)
+    ttl = SOURCE_TTLS.get(source, DEFAULT_TTL)
+    entry = http_cache.get_entry(key)
+
+    request_headers = dict(headers or {})
+    cached = None
+    if entry is not None:
+        value, stored_at = entry
+        cached = _deserialize(value)
+        if time.time() - stored_at < ttl:
+            http_cache.count("hits")
+            return cached
+        if cached.headers.get("ETag"):
+            request_headers["If-None-Match"] = cached.headers["ETag"]
+        if cached.headers.get("Last-Modified"):
+            request_headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+    response = http_get(url, provider=source, headers=request_headers, timeout=timeout)
+
+    if response.status_code == 304 and cached is not None:
+        http_cache.touch(key)
+        http_cache.count("revalidated")
+        return cached
+
+    http_cache.count("misses")
+    if _is_cacheable(response):
+        http_cache.set(key, _serialize(response))
+    return response
+
+
+def http_cache_stats():
+    """Hit/miss/revalidation counters and size of the HTTP response cache."""
+    return http_cache.stats()
@@ -0,0 +1,298 @@
+import http.cookiejar
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .rate_limit import rate_limiter
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Connection pool size per upstream host. Every fetcher in the process shares
+# these pools, so TLS handshakes to the same host are paid once and reused.
+HOST_POOL_SIZES = {
+    "https://www.googleapis.com": int(os.getenv("HTTP_POOL_GOOGLE", 10)),
+    "https://huggingface.co": int(os.getenv("HTTP_POOL_HUGGINGFACE", 20)),
+    "https://api.github.com": int(os.getenv("HTTP_POOL_GITHUB", 10)),
+    "http://export.arxiv.org": int(os.getenv("HTTP_POOL_ARXIV", 10)),
+    "https://export.arxiv.org": int(os.getenv("HTTP_POOL_ARXIV", 10)),
+}
+# Pool size for any other host (scraped pages), and how many such hosts keep
+# a pool around at once.
+DEFAULT_POOL_SIZE = int(os.getenv("HTTP_POOL_DEFAULT", 4))
+DEFAULT_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 100))
+
+# (connect, read) timeouts in seconds per source, used when a caller does not
+# pass its own. Override per source with e.g. HTTP_TIMEOUT_GITHUB=5.
+SOURCE_TIMEOUTS = {
+    "google_search": (3.05, float(os.getenv("HTTP_TIMEOUT_GOOGLE_SEARCH", 8))),
+    "huggingface": (3.05, float(os.getenv("HTTP_TIMEOUT_HUGGINGFACE", 8))),
+    "github": (3.05, float(os.getenv("HTTP_TIMEOUT_GITHUB", 8))),
+    "arxiv": (3.05, float(os.getenv("HTTP_TIMEOUT_ARXIV", 10))),
+}
+DEFAULT_TIMEOUT = (3.05, float(os.getenv("HTTP_TIMEOUT_DEFAULT", 10)))
+
+# Source calls are retried on connection errors, timeouts and these statuses,
+# sleeping a random ("full jitter") time up to base * 2**attempt in between.
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.2))
+HTTP_RETRY_MAX_BACKOFF = float(os.getenv("HTTP_RETRY_MAX_BACKOFF", 2))
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# A source call still unanswered after the host's p95 latency gets a duplicate
+# ("hedge"); whichever answers first wins. Needs HTTP_HEDGE_MIN_SAMPLES
+# latencies from the host before it kicks in.
+HTTP_HEDGING = os.getenv("HTTP_HEDGING", "true").lower() not in ("0", "false", "no")
+HTTP_HEDGE_MIN_SAMPLES = int(os.getenv("HTTP_HEDGE_MIN_SAMPLES", 20))
+HTTP_HEDGE_MIN_DELAY = float(os.getenv("HTTP_HEDGE_MIN_DELAY", 0.05))
+HTTP_HEDGE_WORKERS = int(os.getenv("HTTP_HEDGE_WORKERS", 32))
+LATENCY_WINDOW = 200
+
+# After this many consecutive failures a host's circuit opens and calls to it
+# fail immediately; after CIRCUIT_RESET_TIMEOUT seconds one trial call is let
+# through, which closes the circuit again if it succeeds.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_hedge_executor = ThreadPoolExecutor(max_workers=HTTP_HEDGE_WORKERS, thread_name_prefix="http-hedge")
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """A call was refused because its host has been failing."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one host."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host):
+        self.host = host
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call to the host may go ahead."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= CIRCUIT_RESET_TIMEOUT:
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit open for {self.host} after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def abort_trial(self):
+        """Give back a trial call that ended without reaching the host."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if self.state != self.OPEN:
+                    logger.warning("Opening circuit for %s after %d consecutive failures", self.host, self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class HostStats:
+    """Recent latencies and resilience counters for one host."""
+
+    def __init__(self, host):
+        self.breaker = CircuitBreaker(host)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.retries = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def p95(self):
+        if len(self.latencies) < HTTP_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+_hosts = {}
+
+
+def _host_stats(url):
+    host = urlsplit(url).netloc
+    stats = _hosts.get(host)
+    if stats is None:
+        with _lock:
+            stats = _hosts.setdefault(host, HostStats(host))
+    return stats
+
+
+def _build_session():
+    session = requests.Session()
+    # Shared by every request in the process, so it must stay stateless: keep
+    # no cookies from scraped sites
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    default_adapter = HTTPAdapter(pool_connections=DEFAULT_POOL_HOSTS, pool_maxsize=DEFAULT_POOL_SIZE)
+    session.mount("https://", default_adapter)
+    session.mount("http://", default_adapter)
+    for prefix, size in HOST_POOL_SIZES.items():
+        session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=size))
+    return session
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use.
+
+    A new session is built after a fork so worker processes never share
+    sockets with their parent.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _lock:
+            if _session is None or _session_pid != os.getpid():
+                _session = _build_session()
+                _session_pid = os.getpid()
+    return _session
+
+
+def _timed_get(stats, url, kwargs):
+    started = time.monotonic()
+    response = get_session().get(url, **kwargs)
+    if response.status_code < 500:
+        stats.latencies.append(time.monotonic() - started)
+    return response
+
+
+def _hedged_get(stats, url, provider, kwargs):
+    """GET `url`, sending a duplicate if the first try outlasts the host's p95."""
+    p95 = stats.p95() if HTTP_HEDGING else None
+    if p95 is None:
+        return _timed_get(stats, url, kwargs)
+
+    first = _hedge_executor.submit(_timed_get, stats, url, kwargs)
+    try:
+        return first.result(timeout=max(p95, HTTP_HEDGE_MIN_DELAY))
+    except FutureTimeout:
+        pass
+    # Only hedge when the provider's rate limit can spare the request now
+    if provider is not None and rate_limiter.try_acquire(provider) != 0:
+        return first.result()
+
+    stats.hedges += 1
+    second = _hedge_executor.submit(_timed_get, stats, url, kwargs)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    stats.hedges_won += 1
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def _backoff(attempt):
+    time.sleep(random.uniform(0, min(HTTP_RETRY_MAX_BACKOFF, HTTP_RETRY_BACKOFF * 2 ** attempt)))
+
+
+def http_get(url, provider=None, **kwargs):
+    """`requests.get` over the shared keep-alive connection pools.
+
+    Every call is bounded by a timeout (the source's, unless one is passed)
+    and refused at once while the host's circuit breaker is open.
+
+    With `provider`, the call is a source lookup: it first takes a token
+    from that provider's rate limit (raising RateLimitExceeded if none is
+    coming soon), is retried with jittered backoff on connection errors,
+    timeouts and 5xx responses, and is hedged once it runs past the host's
+    p95 latency. The response's rate limit headers update the provider's
+    budget.
+
+    Each call is recorded as one "upstream" span, retries and hedges included.
+    """
+    with span("http", kind="upstream", upstream=provider or "page", host=urlsplit(url).netloc) as attrs:
+        response = _resilient_get(url, provider, kwargs)
+        attrs["outcome"] = response.status_code
+        return response
+
+
+def _resilient_get(url, provider, kwargs):
+    if kwargs.get("timeout") is None:
+        kwargs["timeout"] = SOURCE_TIMEOUTS.get(provider, DEFAULT_TIMEOUT)
+    stats = _host_stats(url)
+    source_call = provider is not None and not kwargs.get("stream")
+    retries = HTTP_RETRIES if source_call else 0
+
+    for attempt in range(retries + 1):
+        stats.breaker.before_call()
+        try:
+            if provider is not None:
+                rate_limiter.acquire(provider)
+            if source_call:
+                response = _hedged_get(stats, url, provider, kwargs)
+            else:
+                response = _timed_get(stats, url, kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            stats.breaker.record_failure()
+            if attempt == retries:
+                raise
+            stats.retries += 1
+            _backoff(attempt)
+            continue
+        except BaseException:
+            stats.breaker.abort_trial()
+            raise
+
+        if provider is not None:
+            rate_limiter.observe(provider, response)
+        if response.status_code in RETRY_STATUSES:
+            stats.breaker.record_failure()
+            if attempt < retries:
+                response.close()
+                stats.retries += 1
+                _backoff(attempt)
+                continue
+        else:
+            stats.breaker.record_success()
+        return response
+
+
+def upstream_stats():
+    """Circuit state, p95 latency and retry/hedge counters per host."""
+    stats = {}
+    for host, host_stats in list(_hosts.items()):
+        p95 = host_stats.p95()
+        stats[host] = {
+            "circuit": host_stats.breaker.state,
+            "consecutive_failures": host_stats.breaker.failures,
+            "rejected": host_stats.breaker.rejected,
+            "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+            "retries": host_stats.retries,
+            "hedges": host_stats.hedges,
+            "hedges_won": host_stats.hedges_won,
+        }
+    return stats
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ResearchJob
+from .singleflight import research_once
+
+logger = logging.getLogger(__name__)
+
+# Pipeline runs executing at once in this process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Seconds an idle worker waits before checking the queue again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 2))
+# Seconds between a running job's heartbeats
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", 15))
+# A running job without a heartbeat for this many seconds is assumed to
+# belong to a dead worker and goes back on the queue
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", 60))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+_wakeup = threading.Event()
+_lock = threading.Lock()
+_workers_pid = None
+
+
+def submit_job(query):
+    """Queue a research run for `query` and return the new job."""
+    job = ResearchJob.objects.create(query=query)
+    ensure_workers()
+    _wakeup.set()
+    return job
+
+
+def ensure_workers():
+    """Start this process's worker threads if they are not running yet.
+
+    Called when a job is submitted and by the run_jobs command, never on
+    status reads.
+    """
+    global _workers_pid
+    if _workers_pid == os.getpid():
+        return
+    with _lock:
+        if _workers_pid == os.getpid():
+            return
+        for i in range(JOB_WORKERS):
+            threading.Thread(target=_worker_loop, name=f"research-job-{i}", daemon=True).start()
+        _workers_pid = os.getpid()
+    logger.info("Started %d research job workers", JOB_WORKERS)
+
+
+def requeue_stale_jobs():
+    """Return jobs abandoned by a crashed or restarted worker to the queue.
+
+    A job is abandoned once its heartbeat stops: a live worker keeps beating
+    however long the pipeline takes.
+    """
+    cutoff = timezone.now() - timedelta(seconds=JOB_STALE_AFTER)
+    stale = ResearchJob.objects.filter(status=ResearchJob.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    stale.filter(attempts__gte=JOB_MAX_ATTEMPTS).update(
+        status=ResearchJob.FAILED, error="Job was abandoned too many times", finished_at=timezone.now()
+    )
+    return stale.update(status=ResearchJob.PENDING)
+
+
+def claim_next_job():
+    """Atomically move the oldest pending job to running and return it.
+
+    The conditional UPDATE makes the claim safe across threads and worker
+    processes sharing the database: only one of them can win a given job.
+    """
+    pending = ResearchJob.objects.filter(status=ResearchJob.PENDING).order_by("created_at")
+    for job_id in pending.values_list("id", flat=True)[:10]:
+        now = timezone.now()
+        claimed = ResearchJob.objects.filter(id=job_id, status=ResearchJob.PENDING).update(
+            status=ResearchJob.RUNNING, started_at=now, heartbeat_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return ResearchJob.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Run the pipeline for a claimed job and store the outcome."""
+    finished = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job.id, finished), name=f"{threading.current_thread().name}-heartbeat", daemon=True
+    )
+    heartbeat.start()
+    try:
+        job.report = research_once(job.query)
+        job.status = ResearchJob.SUCCEEDED
+    except Exception as e:
+        logger.exception("Research job %s failed", job.id)
+        job.status = ResearchJob.FAILED
+        job.error = str(e)
+    finally:
+        finished.set()
+        heartbeat.join()
+    job.finished_at = timezone.now()
+    job.save(update_fields=["report", "status", "error", "finished_at"])
+
+
+def _heartbeat(job_id, finished):
+    """Mark the job as alive every JOB_HEARTBEAT_INTERVAL until it finishes."""
+    while not finished.wait(JOB_HEARTBEAT_INTERVAL):
+        try:
+            ResearchJob.objects.filter(id=job_id, status=ResearchJob.RUNNING).update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.exception("Heartbeat failed for research job %s", job_id)
+    connection.close()
+
+
+def _worker_loop():
+    while True:
+        try:
+            job = claim_next_job()
+            if job is not None:
+                run_job(job)
+                continue
+            requeue_stale_jobs()
+        except Exception:
+            logger.exception("Research job worker error")
+        finally:
+            close_old_connections()
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+from .cache import SQLiteCache
+from .clients import get_genai_client
+from .rate_limit import rate_limiter
+from .tracing import span
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+llm_cache = SQLiteCache("llm_responses", ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+
+
+def llm_cache_key(model, prompt, config=None):
+    """Content address of a request: the same model, prompt and config give the same key."""
+    content = f"{model}\0{prompt}"
+    if config:
+        content += "\0" + json.dumps(config, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _note_quota_error(error):
+    # google-genai API errors carry the HTTP status as `code`
+    if getattr(error, "code", None) == 429:
+        rate_limiter.backoff("gemini")
+
+
+def cached_generate_content(model, prompt, config=None):
+    """Return the text Gemini generates for `prompt`, answering repeats from the cache.
+
+    `config` is an optional GenerateContentConfig dict (e.g. a JSON response
+    schema). The Gemini client is only created on a cache miss, and misses
+    count against the "gemini" rate limit.
+    """
+    key = llm_cache_key(model, prompt, config)
+    if LLM_CACHE_ENABLED:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached.decode("utf-8")
+
+    rate_limiter.acquire("gemini")
+    try:
+        with span("gemini", kind="upstream", upstream="gemini", model=model):
+            response = get_genai_client().models.generate_content(
+                model=model,
+                contents=prompt,
+                config=config
+            )
+    except Exception as e:
+        _note_quota_error(e)
+        raise
+    text = response.text
+
+    if LLM_CACHE_ENABLED and text:
+        llm_cache.set(key, text.encode("utf-8"))
+    return text
+
+
+def stream_generate_content(model, prompt, config=None):
+    """Yield Gemini's text for `prompt` chunk by chunk as it is generated.
+
+    Shares cache entries with `cached_generate_content`: a hit is yielded as
+    a single chunk, and a fully consumed stream is stored for next time.
+    """
+    key = llm_cache_key(model, prompt, config)
+    if LLM_CACHE_ENABLED:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached.decode("utf-8")
+            return
+
+    rate_limiter.acquire("gemini")
+    chunks = []
+    try:
+        # Spans the whole stream, including time the consumer spends between chunks
+        with span("gemini_stream", kind="upstream", upstream="gemini", model=model):
+            for response in get_genai_client().models.generate_content_stream(
+                model=model,
+                contents=prompt,
+                config=config
+            ):
+                if response.text:
+                    chunks.append(response.text)
+                    yield response.text
+    except Exception as e:
+        _note_quota_error(e)
+        raise
+
+    text = "".join(chunks)
+    if LLM_CACHE_ENABLED and text:
+        llm_cache.set(key, text.encode("utf-8"))
+
+
+def llm_cache_stats():
+    """Hit/miss counters and size of the LLM response cache."""
+    return llm_cache.stats()
@@ -0,0 +1,37 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from research_agent.resource_index import RECORD_PARSERS, read_records, resource_index
+
+
+class Command(BaseCommand):
+    help = "Load exported catalog dumps of a resource source into the local resource index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", nargs="?", choices=sorted(RECORD_PARSERS), help="Source the dumps belong to")
+        parser.add_argument("paths", nargs="*", help="Dump files (JSON, JSON lines or CSV, optionally .gz)")
+        parser.add_argument("--append", action="store_true", help="Add to the source's entries instead of replacing them")
+        parser.add_argument("--stats", action="store_true", help="Show what the index holds and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for source, stats in sorted(resource_index.stats().items()):
+                ingested = time.strftime("%Y-%m-%d %H:%M", time.localtime(stats["ingested_at"]))
+                self.stdout.write(f"{source}: {stats['items']} entries, ingested {ingested}")
+            return
+        if not options["source"] or not options["paths"]:
+            raise CommandError("Give a source and at least one dump file")
+
+        started = time.monotonic()
+        # One load for every file, so the source is swapped in a single commit
+        records = itertools.chain.from_iterable(read_records(path) for path in options["paths"])
+        try:
+            count = resource_index.ingest(options["source"], records, replace=not options["append"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not load {options['source']} dumps: {e}")
+        self.stdout.write(
+            f"Loaded {count} {options['source']} records in {time.monotonic() - started:.1f}s "
+            f"({resource_index.path})"
+        )
@@ -0,0 +1,24 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from research_agent import jobs
+
+
+class Command(BaseCommand):
+    help = "Run research job workers in a dedicated process until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=jobs.JOB_WORKERS, help="Number of worker threads")
+
+    def handle(self, *args, **options):
+        jobs.JOB_WORKERS = options["workers"]
+        requeued = jobs.requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+        jobs.ensure_workers()
+        self.stdout.write(f"Running {jobs.JOB_WORKERS} research job worker(s); press CTRL+C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
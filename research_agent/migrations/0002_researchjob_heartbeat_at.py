@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('research_agent', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='researchjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
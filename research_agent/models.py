@@ -1,3 +1,84 @@
+import hashlib
+import json
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+def normalize_company(name):
+    """Lookup key for a company query: case- and whitespace-insensitive."""
+    return " ".join(name.lower().split())
+
+
+class ResearchResult(models.Model):
+    """One finished research report, stored per request instead of a shared file."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.CharField(max_length=200)
+    company_key = models.CharField(max_length=200)
+    payload = models.JSONField()
+    payload_hash = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["company_key", "-created_at"]),
+            models.Index(fields=["-created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.company} ({self.created_at:%Y-%m-%d %H:%M})"
+
+    @staticmethod
+    def hash_payload(payload):
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def store(cls, company, payload):
+        return cls.objects.create(
+            company=company,
+            company_key=normalize_company(company),
+            payload=payload,
+            payload_hash=cls.hash_payload(payload),
+        )
+
+
+class ResearchJob(models.Model):
+    """A queued run of the research pipeline, persisted so it survives restarts."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    query = models.CharField(max_length=200)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    report = models.ForeignKey(
+        ResearchResult, null=True, blank=True, on_delete=models.SET_NULL, related_name="jobs"
+    )
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"{self.query} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
@@ -3,7 +3,7 @@ import os
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, ListItem, ListFlowable
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, ListItem, ListFlowable, PageBreak
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
 
@@ -25,7 +25,25 @@ def create_pdf_from_json(json_string, output_filename=None):
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON data: {e}")
     
-    # Extract company name from Overview
+    company_name = report_company_name(data)
+    
+    # Set output filename if not provided
+    if not output_filename:
+        output_filename = f"{company_name.replace(' ', '_')}_Research_Report.pdf"
+    
+    # Create PDF document
+    doc = _report_document(output_filename)
+    
+    elements = _report_elements(data, company_name, _report_styles())
+    
+    # Build the PDF
+    doc.build(elements)
+    print(f"PDF created successfully: {output_filename}")
+    return output_filename
+
+
+def report_company_name(data):
+    """Company name for a report's title, taken from the start of its overview."""
     overview = data.get("Overview", "")
     company_name = "Company"
     if overview:
@@ -33,13 +51,11 @@ def create_pdf_from_json(json_string, output_filename=None):
         words = first_sentence.split()
         if len(words) >= 2:
             company_name = words[0] + " " + words[1]
-    
-    # Set output filename if not provided
-    if not output_filename:
-        output_filename = f"{company_name.replace(' ', '_')}_Research_Report.pdf"
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(
+    return company_name
+
+
+def _report_document(output_filename):
+    return SimpleDocTemplate(
         output_filename,
         pagesize=A4,
         rightMargin=72,
@@ -47,8 +63,9 @@ def create_pdf_from_json(json_string, output_filename=None):
         topMargin=72,
         bottomMargin=72
     )
-    
-    # Styles
+
+
+def _report_styles():
     styles = getSampleStyleSheet()
     
     # MODIFY existing styles instead of adding new ones with the same name
@@ -83,7 +100,11 @@ def create_pdf_from_json(json_string, output_filename=None):
         fontName='Helvetica-Bold',
         spaceBefore=6
     ))
-    
+    return styles
+
+
+def _report_elements(data, company_name, styles):
+    overview = data.get("Overview", "")
     # Content elements
     elements = []
     
@@ -171,10 +192,27 @@ def create_pdf_from_json(json_string, output_filename=None):
                 # Handle other resource types similarly (GitHub repos, HuggingFace datasets)
                 
             elements.append(Spacer(1, 0.2 * inch))
-    
-    # Build the PDF
-    doc.build(elements)
-    print(f"PDF created successfully: {output_filename}")
+    return elements
+
+
+def create_combined_pdf(reports, output_filename):
+    """Render several reports into one PDF, each starting on a new page.
+
+    `reports` is a list of (company name, report data) pairs; a name of None
+    is taken from the report's overview as in `create_pdf_from_json`.
+    """
+    for _, data in reports:
+        validate_json_data(data)
+
+    styles = _report_styles()
+    elements = []
+    for position, (company_name, data) in enumerate(reports):
+        if position:
+            elements.append(PageBreak())
+        elements.extend(_report_elements(data, company_name or report_company_name(data), styles))
+
+    _report_document(output_filename).build(elements)
+    print(f"Combined PDF of {len(reports)} reports created successfully: {output_filename}")
     return output_filename
 
 
@@ -0,0 +1,127 @@
+import logging
+
+from .research_main import generate_company_overview, get_company_info, stream_company_overview
+from .usecase_main import (
+    LLM_FUSED_MODE,
+    LLM_STREAMING,
+    UseCaseParser,
+    generate_overview_and_usecases,
+    generate_structured_usecases,
+    stream_ai_usecases,
+)
+from .resources_main import ResourceCollector
+from .tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+
+def _fused_stages(company_name, info, collector):
+    with span("overview_and_usecases"):
+        research_results, use_cases = generate_overview_and_usecases(company_name, info)
+    for use_case in use_cases["use_cases"]:
+        collector.add(use_case["title"])
+    return [("overview", {"Overview": research_results}), ("usecases", {"Usecases": use_cases})]
+
+
+def _two_step_stages(company_name, info, collector):
+    with span("overview"):
+        research_results = generate_company_overview(info)
+    yield "overview", {"Overview": research_results}
+    with span("usecases"):
+        use_cases = generate_structured_usecases(company_name, research_results)
+    for use_case in use_cases["use_cases"]:
+        collector.add(use_case["title"])
+    yield "usecases", {"Usecases": use_cases}
+
+
+def _streaming_stages(company_name, info, collector):
+    """Two-step path on streamed Gemini output.
+
+    Overview chunks are passed on as they arrive, and each use case's resource
+    lookups start as soon as its title has been parsed, while Gemini is still
+    writing the rest of the list.
+    """
+    chunks = []
+    with span("overview"):
+        for chunk in stream_company_overview(info):
+            chunks.append(chunk)
+            yield "overview_chunk", {"text": chunk}
+    research_results = "".join(chunks)
+    yield "overview", {"Overview": research_results}
+
+    # Only titled use cases reach the collector, in the same order as below
+    parser = UseCaseParser(on_title=collector.add)
+    with span("usecases"):
+        for chunk in stream_ai_usecases(company_name, research_results):
+            for use_case in parser.feed(chunk):
+                if use_case["title"]:
+                    yield "usecase", use_case
+    completed = len(parser.use_cases)
+    for use_case in parser.close()[completed:]:
+        if use_case["title"]:
+            yield "usecase", use_case
+    use_cases = {"use_cases": [use_case for use_case in parser.use_cases if use_case["title"]]}
+    yield "usecases", {"Usecases": use_cases}
+
+
+def iter_research(company_name, fused=None, streaming=None, shared_lookups=None):
+    """Run the research pipeline, yielding (event, data) as each stage completes.
+
+    Events, in order: "overview", "usecases", one "resources" per use case (in
+    completion order, with its position under "index"), and finally "done"
+    carrying the full report. When streaming, "overview_chunk" events carry
+    the overview text as it is generated and a "usecase" event follows each
+    parsed use case; resource lookups then start before "usecases".
+
+    Each stage is recorded as a tracing span (see tracing.py).
+
+    With `fused` (default: LLM_FUSED_MODE) the overview and use cases come from
+    one structured Gemini call, falling back to the two-step path on failure.
+    `shared_lookups` (a LookupMemo) shares resource lookups with other runs.
+    """
+    fused = LLM_FUSED_MODE if fused is None else fused
+    streaming = LLM_STREAMING if streaming is None else streaming
+    logger.info("Conducting market research: %s", company_name)
+
+    # Step 1 : Market research, Step 2 : AI/Ml use cases generation
+    info = get_company_info(company_name)
+    collector = ResourceCollector(shared_lookups)
+    stages = None
+    if fused:
+        try:
+            stages = _fused_stages(company_name, info, collector)
+        except Exception as e:
+            logger.warning("Fused LLM call failed for %s, falling back to two steps: %s", company_name, e)
+    if stages is None:
+        stages = (_streaming_stages if streaming else _two_step_stages)(company_name, info, collector)
+
+    for event, data in stages:
+        if event == "overview":
+            research_results = data["Overview"]
+        elif event == "usecases":
+            use_cases = data["Usecases"]
+        yield event, data
+
+    # Step 3: Generate relevant resources for each usecases
+    collected = {}
+    # Lookups started with the use cases; this times the wait for the rest
+    with span("resources", lookups=collector.lookup_count):
+        for index, entry in collector.iter_completed():
+            collected[index] = entry
+            yield "resources", {"index": index, **entry}
+    resources = {"use_cases_resources": [collected[i] for i in sorted(collected)]}
+
+    yield "done", {
+        "message": f"Successfully completed the research for {company_name}",
+        "Overview": research_results,
+        "Usecases": use_cases,
+        "Resources": resources
+    }
+
+
+def run_research(company_name, fused=None, streaming=None, shared_lookups=None):
+    """Run the full research pipeline for one company and return the report."""
+    for event, data in iter_research(company_name, fused, streaming, shared_lookups):
+        if event == "done":
+            return data
@@ -0,0 +1,60 @@
+import math
+import os
+from collections import Counter
+
+from .format_result import words_of
+
+# Tokens of scraped text sent to Gemini for the overview, estimated at
+# CHARS_PER_TOKEN characters per token. The old path cut 3000 characters and
+# then dropped repeats, leaving about 2.5k; the budget now only holds
+# distinct sentences, so 2.4k carries as much
+COMPANY_INFO_TOKENS = int(os.getenv("COMPANY_INFO_TOKENS", 600))
+CHARS_PER_TOKEN = 4
+
+# BM25 term-frequency saturation and length normalisation
+BM25_K1 = float(os.getenv("BM25_K1", 1.5))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+
+# What the overview prompt asks about, added to the company name when scoring
+PROFILE_TERMS = (
+    "company founded headquartered business products services customers revenue "
+    "employees acquired launched platform industry"
+)
+
+
+class BM25Index:
+    """In-memory BM25 index over a list of short texts (paragraphs)."""
+
+    def __init__(self, texts, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(words_of(text)) for text in texts]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        count = len(texts)
+        self.idf = {
+            term: math.log((count - frequency + 0.5) / (frequency + 0.5) + 1)
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query):
+        """BM25 score of every text for `query`, in index order."""
+        terms = [term for term in set(words_of(query)) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            scores.append(sum(
+                self.idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                for term in terms if term in counts
+            ))
+        return scores
+
+
+def rank_paragraphs(paragraphs, company_name):
+    """`paragraphs` from best to worst match for the company profile; ties keep their order."""
+    if not paragraphs:
+        return []
+    scores = BM25Index(paragraphs).scores(f"{company_name} {PROFILE_TERMS}")
+    order = sorted(range(len(paragraphs)), key=lambda i: -scores[i])
+    return [paragraphs[i] for i in order]
@@ -0,0 +1,292 @@
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from .cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Requests per minute each provider is allowed, shared by every worker. The
+# bucket holds at most a minute's worth, so short bursts are allowed. Override
+# per provider with e.g. RATE_LIMIT_GITHUB=30.
+PROVIDER_RATES = {
+    "google_search": float(os.getenv("RATE_LIMIT_GOOGLE_SEARCH", 60)),
+    # GitHub search allows 10 requests/minute unauthenticated, 30 with a token
+    "github": float(os.getenv("RATE_LIMIT_GITHUB", 30 if os.getenv("GITHUB_API_KEY") else 10)),
+    "huggingface": float(os.getenv("RATE_LIMIT_HUGGINGFACE", 300)),
+    # arXiv asks clients to send no more than one request every three seconds
+    "arxiv": float(os.getenv("RATE_LIMIT_ARXIV", 20)),
+    "kaggle": float(os.getenv("RATE_LIMIT_KAGGLE", 60)),
+    "gemini": float(os.getenv("RATE_LIMIT_GEMINI", 15)),
+}
+# Longest (seconds) a call waits for a token before it is shed with
+# RateLimitExceeded instead
+PROVIDER_MAX_WAIT = {
+    "gemini": float(os.getenv("RATE_LIMIT_MAX_WAIT_GEMINI", 30)),
+}
+DEFAULT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 5))
+# How long a provider is paused after a 429 that did not say for how long
+DEFAULT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", 30))
+
+
+_patience = contextvars.ContextVar("rate_limit_patience", default=0)
+
+
+@contextmanager
+def patient(max_wait):
+    """Let calls made inside the block (and in work it hands to threads
+    through `tracing.in_context`) wait up to `max_wait` seconds for a token,
+    for callers that would rather be slow than fail, e.g. batch runs."""
+    token = _patience.set(max_wait)
+    try:
+        yield
+    finally:
+        _patience.reset(token)
+
+
+def patience():
+    """The `max_wait` of the enclosing `patient` block, or 0 outside one."""
+    return _patience.get()
+
+
+class RateLimitExceeded(requests.RequestException):
+    """A call was shed because its provider has no budget left for a while."""
+
+    def __init__(self, provider, retry_after):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} rate limit reached, retry in {retry_after:.0f}s")
+
+
+class RateLimiter:
+    """Token buckets per provider, kept in SQLite so all workers share them.
+
+    Every call takes a token; tokens refill at the provider's rate. When the
+    upstream reports its own budget (X-RateLimit-Remaining / -Reset,
+    Retry-After, or a 429), the provider is paused until the upstream says
+    it has budget again, so we stop spending requests that would fail.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "rate_limits.sqlite3")
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " provider TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL,"
+                " blocked_until REAL NOT NULL DEFAULT 0, upstream_limit INTEGER,"
+                " upstream_remaining INTEGER, upstream_reset REAL,"
+                " granted INTEGER NOT NULL DEFAULT 0, throttled INTEGER NOT NULL DEFAULT 0,"
+                " shed INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _bucket(self, conn, provider, now):
+        capacity = PROVIDER_RATES[provider]
+        row = conn.execute(
+            "SELECT tokens, updated_at, blocked_until FROM buckets WHERE provider = ?", (provider,)
+        ).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO buckets (provider, tokens, updated_at) VALUES (?, ?, ?)", (provider, capacity, now)
+            )
+            return capacity, 0.0
+        tokens, updated_at, blocked_until = row
+        return min(capacity, tokens + (now - updated_at) * capacity / 60), blocked_until
+
+    def try_acquire(self, provider):
+        """Take a token for `provider` if one is available.
+
+        Returns 0 on success, otherwise the number of seconds until one will be.
+        """
+        if not RATE_LIMIT_ENABLED or provider not in PROVIDER_RATES:
+            return 0
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, blocked_until = self._bucket(conn, provider, now)
+            if blocked_until > now:
+                wait = blocked_until - now
+            elif tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) * 60 / PROVIDER_RATES[provider]
+            conn.execute(
+                "UPDATE buckets SET tokens = ?, updated_at = ? WHERE provider = ?", (tokens, now, provider)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, provider, max_wait=None):
+        """Wait for a token for `provider`, or raise RateLimitExceeded.
+
+        A call that would have to wait longer than `max_wait` seconds (default:
+        the provider's configured maximum, or longer inside `patient`) is shed
+        right away.
+        """
+        if not RATE_LIMIT_ENABLED or provider not in PROVIDER_RATES:
+            return
+        if max_wait is None:
+            max_wait = max(PROVIDER_MAX_WAIT.get(provider, DEFAULT_MAX_WAIT), _patience.get())
+        deadline = time.monotonic() + max_wait
+        throttled = False
+        while True:
+            wait = self.try_acquire(provider)
+            if wait == 0:
+                self._count(provider, "granted")
+                if throttled:
+                    self._count(provider, "throttled")
+                return
+            if time.monotonic() + wait > deadline:
+                self._count(provider, "shed")
+                raise RateLimitExceeded(provider, wait)
+            throttled = True
+            time.sleep(wait)
+
+    def observe(self, provider, response):
+        """Update `provider`'s budget from the rate limit headers of `response`."""
+        if not RATE_LIMIT_ENABLED or provider not in PROVIDER_RATES:
+            return
+        headers = response.headers
+        limit = _int_header(headers, "X-RateLimit-Limit", "RateLimit-Limit")
+        remaining = _int_header(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+        reset = _reset_time(headers)
+        retry_after = _retry_after(headers)
+
+        blocked_until = None
+        if retry_after is not None:
+            blocked_until = time.time() + retry_after
+        elif response.status_code == 429 or remaining == 0:
+            blocked_until = reset or time.time() + DEFAULT_BACKOFF
+        if limit is None and remaining is None and blocked_until is None:
+            return
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, current_block = self._bucket(conn, provider, time.time())
+            if remaining is not None:
+                tokens = min(tokens, remaining)
+            conn.execute(
+                "UPDATE buckets SET tokens = ?, updated_at = ?, blocked_until = ?,"
+                " upstream_limit = COALESCE(?, upstream_limit),"
+                " upstream_remaining = COALESCE(?, upstream_remaining),"
+                " upstream_reset = COALESCE(?, upstream_reset) WHERE provider = ?",
+                (tokens, time.time(), max(current_block, blocked_until or 0), limit, remaining, reset, provider),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if blocked_until is not None:
+            logger.warning("%s rate limit reached, pausing for %.0fs", provider, blocked_until - time.time())
+
+    def backoff(self, provider, seconds=None):
+        """Pause `provider` after it rejected a call for exceeding its quota."""
+        if not RATE_LIMIT_ENABLED or provider not in PROVIDER_RATES:
+            return
+        until = time.time() + (DEFAULT_BACKOFF if seconds is None else seconds)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._bucket(conn, provider, time.time())
+            conn.execute(
+                "UPDATE buckets SET blocked_until = MAX(blocked_until, ?) WHERE provider = ?", (until, provider)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        logger.warning("%s rejected a call for exceeding its quota, pausing for %.0fs", provider, until - time.time())
+
+    def _count(self, provider, counter):
+        self._connect().execute(f"UPDATE buckets SET {counter} = {counter} + 1 WHERE provider = ?", (provider,))
+
+    def stats(self):
+        """Remaining budget and throttling counters for every provider."""
+        now = time.time()
+        rows = {
+            row[0]: row[1:] for row in self._connect().execute(
+                "SELECT provider, tokens, updated_at, blocked_until, upstream_limit, upstream_remaining,"
+                " upstream_reset, granted, throttled, shed FROM buckets"
+            )
+        }
+        stats = {}
+        for provider, rate in PROVIDER_RATES.items():
+            tokens, updated_at, blocked_until, limit, remaining, reset, granted, throttled, shed = rows.get(
+                provider, (rate, now, 0, None, None, None, 0, 0, 0)
+            )
+            stats[provider] = {
+                "rate_per_minute": rate,
+                "tokens": round(min(rate, tokens + (now - updated_at) * rate / 60), 2),
+                "blocked_for": round(max(blocked_until - now, 0), 1),
+                "upstream_limit": limit,
+                "upstream_remaining": remaining,
+                "upstream_reset_in": None if reset is None else round(max(reset - now, 0), 1),
+                "granted": granted,
+                "throttled": throttled,
+                "shed": shed,
+            }
+        return stats
+
+
+def _int_header(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except ValueError:
+                pass
+    return None
+
+
+def _reset_time(headers):
+    """Epoch time the upstream budget resets; GitHub sends an epoch, others a delta."""
+    reset = _int_header(headers, "X-RateLimit-Reset", "RateLimit-Reset")
+    if reset is None:
+        return None
+    return float(reset) if reset > 1e9 else time.time() + reset
+
+
+def _retry_after(headers):
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limit_stats():
+    return rate_limiter.stats()
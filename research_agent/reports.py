@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import CACHE_DIR
+from .pdf_generator import create_pdf_from_json
+
+logger = logging.getLogger(__name__)
+
+# Rendered PDFs are cached on disk under the hash of the report payload, so a
+# report is only ever rendered once no matter how often it is downloaded.
+REPORTS_DIR = os.getenv("REPORTS_DIR", os.path.join(CACHE_DIR, "reports"))
+PDF_CACHE_MAX_FILES = int(os.getenv("PDF_CACHE_MAX_FILES", 500))
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", 2))
+
+_render_executor = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix="pdf-render")
+_render_locks = {}
+_render_locks_guard = threading.Lock()
+
+
+def pdf_path(payload_hash):
+    return os.path.join(REPORTS_DIR, f"{payload_hash}.pdf")
+
+
+def pdf_etag(payload_hash):
+    return f'"{payload_hash}"'
+
+
+def render_pdf(payload_hash, payload):
+    """Return the path of the rendered PDF for a payload, rendering it if needed.
+
+    The PDF is written to a temporary name and moved into place, so readers
+    (including other worker processes) never see a half-written file.
+    """
+    path = pdf_path(payload_hash)
+    try:
+        # Mark it as used, so the cache prunes the least recently used PDFs
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    with _render_locks_guard:
+        lock = _render_locks.setdefault(payload_hash, threading.Lock())
+    with lock:
+        if not os.path.exists(path):
+            os.makedirs(REPORTS_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                create_pdf_from_json(json.dumps(payload), tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            _prune_cache()
+    with _render_locks_guard:
+        _render_locks.pop(payload_hash, None)
+    return path
+
+
+def open_pdf(payload_hash, payload):
+    """Open the rendered PDF for a payload, rendering it if needed.
+
+    An open file stays readable even if the cache prunes it afterwards.
+    """
+    try:
+        return open(render_pdf(payload_hash, payload), "rb")
+    except FileNotFoundError:
+        # Pruned between rendering and opening it
+        return open(render_pdf(payload_hash, payload), "rb")
+
+
+def run_in_render_pool(fn, *args):
+    """Run `fn(*args)` on the PDF render pool, logging it if it fails."""
+    future = _render_executor.submit(fn, *args)
+    future.add_done_callback(_log_render_failure)
+    return future
+
+
+def render_pdf_in_background(result):
+    """Pre-render a stored result's PDF so its first download is instant."""
+    return run_in_render_pool(render_pdf, result.payload_hash, result.payload)
+
+
+def _log_render_failure(future):
+    if future.exception() is not None:
+        logger.error("Background PDF render failed: %s", future.exception())
+
+
+def _prune_cache():
+    """Drop the least recently used PDFs (and batch bundles) beyond PDF_CACHE_MAX_FILES."""
+    entries = [entry for entry in os.scandir(REPORTS_DIR) if entry.name.endswith((".pdf", ".zip"))]
+    if len(entries) <= PDF_CACHE_MAX_FILES:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[PDF_CACHE_MAX_FILES:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """Parse a single-range `Range` header into inclusive (start, end) offsets.
+
+    Returns None when the header is absent, invalid (such as bytes=500-100)
+    or not a single byte range: the whole file should be served. Raises
+    ValueError when a valid range cannot be satisfied.
+    """
+    match = _RANGE_RE.match((header or "").strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, min(int(end), size - 1) if end else size - 1
@@ -1,23 +1,40 @@
+import codecs
 import os
 import re
 import requests
 from .format_result import *
-from bs4 import BeautifulSoup
+from .llm_cache import cached_generate_content, stream_generate_content
+from .http_cache import cached_get
+from .http_client import http_get
+from .ranking import CHARS_PER_TOKEN, COMPANY_INFO_TOKENS, rank_paragraphs
+from .tracing import in_context, span
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
 from urllib.parse import urlparse
-from google import genai
 
 GOOGLE_SEARCH_API_KEY = os.getenv("GOOGLE_SEARCH_API")
-GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
 CX = "b5e652f249c6144c2"
+# Upstream endpoint, overridable to point at a local stand-in (see benchmarks/)
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
 
-# Configure Gemini API key
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Scraping limits: pages are fetched in parallel, and we stop downloading a
+# page after SCRAPE_MAX_BYTES or once SCRAPE_TEXT_LIMIT characters of <p> text
+# have been collected from it. Paragraphs from all pages then compete for
+# the COMPANY_INFO_TOKENS budget (see ranking.py).
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", 6))
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", 512 * 1024))
+SCRAPE_TEXT_LIMIT = int(os.getenv("SCRAPE_TEXT_LIMIT", 3000))
+SCRAPE_CHUNK_SIZE = 16 * 1024
+
+_scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS, thread_name_prefix="scrape")
 
 def search_google(query):
     """Fetch top search results from Google API and prioritize Wikipedia."""
-    url = f"https://www.googleapis.com/customsearch/v1?q={query}&key={GOOGLE_SEARCH_API_KEY}&cx={CX}"
-    response = requests.get(url)
-    data = response.json()
+    url = GOOGLE_SEARCH_URL
+    params = {"q": query, "key": GOOGLE_SEARCH_API_KEY, "cx": CX}
+    with span("search_google"):
+        response = cached_get("google_search", url, params=params)
+        data = response.json()
     
     links = [item["link"] for item in data.get("items", [])[:5]]  # Get top 5 results
     
@@ -28,57 +45,157 @@ def search_google(query):
     
     return links
 
-def extract_text_from_url(url):
-    """Scrape text from a URL with improved filtering."""
+class ParagraphCollector(HTMLParser):
+    """Incremental HTML parser that only keeps the text inside <p> tags.
+
+    Text is collected as the document is fed, so the caller can stop feeding
+    (and downloading) as soon as `done` is set.
+    """
+
+    SKIP_TAGS = {"script", "style", "noscript", "template"}
+    # Start tags that end an open paragraph, like HTML's implicit </p>
+    BLOCK_TAGS = {
+        "p", "div", "section", "article", "aside", "header", "footer", "nav", "main",
+        "blockquote", "pre", "table", "form", "ul", "ol", "li", "dl", "hr",
+        "h1", "h2", "h3", "h4", "h5", "h6",
+    }
+
+    def __init__(self, text_limit):
+        super().__init__(convert_charrefs=True)
+        self.text_limit = text_limit
+        self.paragraphs = []
+        self.collected = 0
+        self._current = None
+        self._skip = 0
+
+    @property
+    def done(self):
+        return self.collected >= self.text_limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+            return
+        if tag in self.BLOCK_TAGS and self._current is not None:
+            self._flush()
+        if tag == "p":
+            self._current = []
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag == "p" and self._current is not None:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._current is not None and not self._skip:
+            self._current.append(data)
+            self.collected += len(data)
+
+    def close(self):
+        super().close()
+        if self._current is not None:
+            self._flush()
+
+    def _flush(self):
+        self.paragraphs.append("".join(self._current))
+        self._current = None
+
+    def get_text(self):
+        """The paragraphs collected so far, one per line."""
+        paragraphs = self.paragraphs + ["".join(self._current)] if self._current else self.paragraphs
+        return "\n".join(filter(None, (" ".join(paragraph.split()) for paragraph in paragraphs)))
+
+
+def _incremental_decoder(encoding):
+    """Decoder that copes with multi-byte characters split across chunks."""
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="ignore")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+
+def extract_text_from_url(url, max_bytes=None, text_limit=SCRAPE_TEXT_LIMIT):
+    """Scrape text from a URL with improved filtering.
+
+    The response is streamed and parsed as it arrives; reading stops after
+    `max_bytes` of body or once enough <p> text has been collected.
+    """
+    max_bytes = SCRAPE_MAX_BYTES if max_bytes is None else max_bytes
     try:
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Extract text from paragraph tags
-        paragraphs = soup.find_all("p")
-        text = " ".join([p.get_text() for p in paragraphs])
-        
-        # Remove common unwanted phrases
-        unwanted_phrases = [
-            "Read more", "Learn more", "Click here", "Subscribe", "Sign up",
-            "Follow us", "Contact us", "Get started", "All rights reserved"
-        ]
-        for phrase in unwanted_phrases:
-            text = text.replace(phrase, "")
-        
-        # Limit text to 1500 characters
-        return text[:1500] if text else "No relevant content found."
+        parser = ParagraphCollector(text_limit)
+
+        with http_get(url, headers=headers, timeout=5, stream=True) as response:
+            # Only trust an explicit charset; requests falls back to ISO-8859-1 for
+            # any text/* response, and sniffing would need the whole body
+            charset = response.encoding if "charset" in response.headers.get("Content-Type", "") else None
+            decoder = _incremental_decoder(charset)
+            received = 0
+            for chunk in response.iter_content(chunk_size=SCRAPE_CHUNK_SIZE):
+                chunk = chunk[:max_bytes - received]
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if parser.done or received >= max_bytes:
+                    break
+        parser.close()
+
+        # Extract text from paragraph tags, one paragraph per line; boilerplate
+        # is cleaned up once the paragraphs have been selected
+        text = parser.get_text()[:text_limit]
+        return text if text else "No relevant content found."
     
     except Exception as e:
         return f"Error extracting content: {e}"
     
-def generate_company_overview(scraped_info):
-    """Generates a company overview using Google Gemini."""
-    prompt = (
+OVERVIEW_MODEL = "gemini-2.0-flash"
+
+
+def _overview_prompt(scraped_info):
+    return (
         "Provide a 200 words concise and well-structured summary of the following company details. "
         "Ensure key information is retained while removing redundancy and unnecessary details. "
         "Focus on the company's core business, major milestones, and recent developments:\n\n"
         f"{scraped_info}"
     )
 
-    model = "gemini-2.0-flash"
 
-    response = client.models.generate_content(
-        model=model,
-        contents=prompt
-    )
+def generate_company_overview(scraped_info):
+    """Generates a company overview using Google Gemini."""
+    return cached_generate_content(OVERVIEW_MODEL, _overview_prompt(scraped_info))
+
+
+def stream_company_overview(scraped_info):
+    """Like generate_company_overview, but yields the text in chunks as Gemini writes it."""
+    return stream_generate_content(OVERVIEW_MODEL, _overview_prompt(scraped_info))
 
-    return response.text   
+
+def _scrape(url):
+    with span("scrape", host=urlparse(url).netloc):
+        return extract_text_from_url(url)
 
 
 def get_company_info(company_name):
     """Search, scrape, and summarize company info"""
-    search_results = search_google(company_name + " company profile")
-    extracted_texts = [extract_text_from_url(url) for url in search_results]
-    
-    # Combine extracted texts
-    combined_text = remove_duplicates(truncate_text(clean_irrelevant_content(" ".join(extracted_texts))))
+    with span("company_info"):
+        search_results = search_google(company_name + " company profile")
+        extracted_texts = list(_scrape_executor.map(in_context(_scrape), search_results))
+        # Mirrors and reposts of a page already scraped add nothing new
+        extracted_texts = drop_near_duplicate_documents(extracted_texts)
+
+        # Paragraphs from every page (each up to its first stop phrase), best
+        # match for the company first, so the budget keeps the most relevant
+        # ones whichever page they came from
+        paragraphs = [
+            paragraph
+            for text in extracted_texts
+            for paragraph in truncate_at_stop_phrase(text).split("\n")
+            if paragraph
+        ]
+        ranked = rank_paragraphs(paragraphs, company_name)
+        combined_text = clean_scraped_text(
+            "\n".join(ranked), limit=COMPANY_INFO_TOKENS * CHARS_PER_TOKEN, truncated=True
+        )
     
     return combined_text 
 
@@ -0,0 +1,292 @@
+import csv
+import gzip
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import CACHE_DIR
+
+# Local full-text index of exported source catalogs, filled with
+# `python manage.py ingest_resources`. Lookups try it before the live APIs.
+RESOURCE_INDEX_ENABLED = os.getenv("RESOURCE_INDEX_ENABLED", "true").lower() not in ("0", "false", "no")
+RESOURCE_INDEX_PATH = os.getenv("RESOURCE_INDEX_PATH", os.path.join(CACHE_DIR, "resource_index.sqlite3"))
+# A lookup with fewer index matches than this goes to the live API instead
+RESOURCE_INDEX_MIN_RESULTS = int(os.getenv("RESOURCE_INDEX_MIN_RESULTS", 3))
+# Sources ingested longer ago than this (days) are ignored; 0 never expires them
+RESOURCE_INDEX_MAX_AGE_DAYS = float(os.getenv("RESOURCE_INDEX_MAX_AGE_DAYS", 30))
+# How much popularity (downloads, stars, votes) counts next to text relevance
+RESOURCE_INDEX_POPULARITY_WEIGHT = float(os.getenv("RESOURCE_INDEX_POPULARITY_WEIGHT", 0.1))
+
+# Rows per INSERT batch while ingesting
+INGEST_BATCH_SIZE = 5000
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _words(value):
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(item) for item in value)
+    return str(value or "")
+
+
+def _huggingface_model(record):
+    name = record.get("id") or record.get("modelId")
+    if not name:
+        return None
+    description = " ".join([_words(record.get("pipeline_tag")), _words(record.get("tags"))])
+    return name, description, f"https://huggingface.co/{name}", _number(record.get("downloads"))
+
+
+def _huggingface_dataset(record):
+    name = record.get("id")
+    if not name:
+        return None
+    description = " ".join([_words(record.get("description")), _words(record.get("tags"))])
+    return name, description, f"https://huggingface.co/datasets/{name}", _number(record.get("downloads"))
+
+
+def _kaggle_dataset(record):
+    ref = record.get("ref")
+    if not ref:
+        return None
+    description = " ".join([_words(record.get("title")), _words(record.get("subtitle")), _words(record.get("keywords"))])
+    popularity = _number(record.get("downloadCount") or record.get("totalVotes") or record.get("voteCount"))
+    return ref, description, f"https://www.kaggle.com/datasets/{ref}", popularity
+
+
+def _github_repository(record):
+    name = record.get("full_name")
+    if not name:
+        return None
+    description = " ".join([_words(record.get("description")), _words(record.get("topics"))])
+    url = record.get("html_url") or f"https://github.com/{name}"
+    return name, description, url, _number(record.get("stargazers_count"))
+
+
+def _arxiv_paper(record):
+    paper_id = record.get("id")
+    title = " ".join(_words(record.get("title")).split())
+    if not paper_id or not title:
+        return None
+    description = " ".join([_words(record.get("abstract")), _words(record.get("categories"))])
+    return title, description, f"http://arxiv.org/abs/{paper_id}", 0.0
+
+
+# Source key (as in resources_main.RESOURCE_SOURCES) -> function turning one
+# catalog record into (name, description, url, popularity), or None to skip it.
+# Records follow the upstream APIs: Hugging Face /api/models and
+# /api/datasets listings, `kaggle datasets list --csv`, GitHub repository
+# objects and the arXiv metadata snapshot.
+RECORD_PARSERS = {
+    "huggingface_models": _huggingface_model,
+    "huggingface_datasets": _huggingface_dataset,
+    "kaggle_datasets": _kaggle_dataset,
+    "github_repositories": _github_repository,
+    "research_papers": _arxiv_paper,
+}
+
+# The key each source's results use for the item name
+NAME_FIELDS = {"research_papers": "title"}
+
+
+def _items(document):
+    # API responses saved as-is wrap their entries, e.g. GitHub search pages
+    if isinstance(document, dict) and isinstance(document.get("items"), list):
+        return document["items"]
+    return document if isinstance(document, list) else [document]
+
+
+def read_records(path):
+    """Yield the records of a catalog dump.
+
+    Dumps are CSV with a header row, JSON lines, or one JSON document (an
+    array, or an API response with an "items" list, pretty-printed or not).
+    `.gz` files are decompressed on the fly.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        if path.removesuffix(".gz").endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        line = f.readline()
+        while line and not line.strip():
+            line = f.readline()
+        try:
+            first = json.loads(line) if line.lstrip()[:1] == "{" else None
+        except ValueError:
+            first = None
+        if first is None:
+            # Not one record per line: parse the whole document
+            yield from _items(json.loads(line + f.read()))
+            return
+        yield from _items(first)
+        for line in f:
+            if line.strip():
+                yield from _items(json.loads(line))
+
+
+class ResourceIndex:
+    """SQLite FTS5 index over catalog entries of every resource source.
+
+    Entries live in a plain `items` table. Each source has its own FTS5
+    table over their names and descriptions (Porter-stemmed, so
+    "forecasting" finds "forecasts"), kept in step by triggers, so a search
+    only ever scores entries of its own source. Readers open the file per
+    thread and never create it; a missing or unreadable index makes every
+    search a miss.
+    """
+
+    def __init__(self, path=RESOURCE_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self, create=False):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if not create and not os.path.exists(self.path):
+                return None
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " id INTEGER PRIMARY KEY, source TEXT NOT NULL, name TEXT NOT NULL,"
+                " description TEXT NOT NULL, url TEXT NOT NULL, weight REAL NOT NULL,"
+                " UNIQUE (source, url))"
+            )
+            for source in RECORD_PARSERS:
+                self._create_fts(conn, source)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                " source TEXT PRIMARY KEY, items INTEGER NOT NULL, ingested_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_fts(self, conn, source):
+        table = f"fts_{source}"
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            " name, description, content='items', content_rowid='id', tokenize='porter unicode61')"
+        )
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON items WHEN new.source = '{source}' BEGIN"
+            f" INSERT INTO {table} (rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE ON items WHEN new.source = '{source}' BEGIN"
+            f" INSERT INTO {table} ({table}, rowid, name, description)"
+            " VALUES ('delete', old.id, old.name, old.description);"
+            f" INSERT INTO {table} (rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+
+    def ingest(self, source, records, replace=True):
+        """Load catalog `records` for `source` and return how many were loaded.
+
+        With `replace`, the source's previous entries are dropped first;
+        otherwise entries are added or updated by URL. The load is one
+        transaction, so readers see the old contents until it commits.
+        """
+        parse = RECORD_PARSERS[source]
+        conn = self._connect(create=True)
+        count = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if replace:
+                # Cheaper than one 'delete' per entry, and only touches this source
+                conn.execute(f"INSERT INTO fts_{source} (fts_{source}) VALUES ('delete-all')")
+                conn.execute("DELETE FROM items WHERE source = ?", (source,))
+            batch = []
+            for record in records:
+                parsed = parse(record)
+                if parsed is None:
+                    continue
+                name, description, url, popularity = parsed
+                batch.append((source, name, description, url, math.log1p(max(popularity, 0))))
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    count += self._insert(conn, batch)
+                    batch = []
+            count += self._insert(conn, batch)
+            total = conn.execute("SELECT COUNT(*) FROM items WHERE source = ?", (source,)).fetchone()[0]
+            conn.execute(
+                "INSERT INTO sources (source, items, ingested_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(source) DO UPDATE SET items = excluded.items, ingested_at = excluded.ingested_at",
+                (source, total, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def _insert(self, conn, rows):
+        conn.executemany(
+            "INSERT INTO items (source, name, description, url, weight) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(source, url) DO UPDATE SET"
+            " name = excluded.name, description = excluded.description, weight = excluded.weight",
+            rows,
+        )
+        return len(rows)
+
+    def _fresh(self, conn, source):
+        row = conn.execute("SELECT ingested_at FROM sources WHERE source = ?", (source,)).fetchone()
+        if row is None:
+            return False
+        return not RESOURCE_INDEX_MAX_AGE_DAYS or time.time() - row[0] <= RESOURCE_INDEX_MAX_AGE_DAYS * 86400
+
+    def search(self, source, keywords, limit=5):
+        """Best `limit` entries of `source` matching every keyword, shaped like
+        the live fetch results, or None when the index can't answer.
+
+        If all keywords together match fewer than RESOURCE_INDEX_MIN_RESULTS
+        entries, the two leading keywords are tried on their own (as the
+        GitHub OR-query does). Entries rank by BM25, names weighing more than
+        descriptions, nudged by popularity.
+        """
+        try:
+            conn = self._connect()
+            if conn is None or not self._fresh(conn, source):
+                return None
+            attempts = [keywords, keywords[:2]] if len(keywords) > 2 else [keywords]
+            for terms in attempts:
+                match = " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+                rows = conn.execute(
+                    f"SELECT items.name, items.url FROM fts_{source} JOIN items ON items.id = fts_{source}.rowid"
+                    f" WHERE fts_{source} MATCH ? ORDER BY bm25(fts_{source}, 4.0, 1.0) - ? * items.weight LIMIT ?",
+                    (match, RESOURCE_INDEX_POPULARITY_WEIGHT, limit),
+                ).fetchall()
+                if len(rows) >= min(RESOURCE_INDEX_MIN_RESULTS, limit):
+                    name_field = NAME_FIELDS.get(source, "name")
+                    return [{name_field: name, "url": url} for name, url in rows]
+        except sqlite3.Error:
+            return None
+        return None
+
+    def stats(self):
+        """Entries and ingest time per indexed source."""
+        conn = self._connect()
+        if conn is None:
+            return {}
+        return {
+            source: {"items": items, "ingested_at": ingested_at}
+            for source, items, ingested_at in conn.execute("SELECT source, items, ingested_at FROM sources")
+        }
+
+
+resource_index = ResourceIndex()
+
+
+def search_index(source, keywords, limit=5):
+    """`resource_index.search`, or None when the index is turned off."""
+    if not RESOURCE_INDEX_ENABLED or not keywords:
+        return None
+    return resource_index.search(source, keywords, limit)
@@ -1,19 +1,59 @@
 import os
+import re
 import requests
 from dotenv import load_dotenv
 import xml.etree.ElementTree as ET
 import subprocess
 import json
-import feedparser
-from kaggle.api.kaggle_api_extended import KaggleApi
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .clients import get_kaggle_api
+from .http_cache import cached_get
+from .rate_limit import patience, rate_limiter
+from .resource_index import search_index
+from .tracing import in_context, span
+
+logger = logging.getLogger(__name__)
 
 GITHUB_TOKEN = os.getenv("GITHUB_API_KEY")
 
-os.environ['KAGGLE_USERNAME'] = os.getenv("KAGGLE_USERNAME")
-os.environ['KAGGLE_KEY'] = os.getenv("KAGGLE_KEY")
+# Upstream endpoints, overridable to point at local stand-ins (see benchmarks/)
+HUGGINGFACE_API_URL = os.getenv("HUGGINGFACE_API_URL", "https://huggingface.co/api")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "http://export.arxiv.org/api/query")
+
+# Fan-out limits: how many lookups each source may run at once, and how long
+# (in seconds, measured from the start of the fan-out) we wait for a source
+# before filling its slot with an error. Inside `rate_limit.patient` the wait
+# is longer by the patience.
+SOURCE_CONCURRENCY = {
+    "huggingface_models": int(os.getenv("HF_CONCURRENCY", 4)),
+    "huggingface_datasets": int(os.getenv("HF_CONCURRENCY", 4)),
+    "kaggle_datasets": int(os.getenv("KAGGLE_CONCURRENCY", 2)),
+    "github_repositories": int(os.getenv("GITHUB_CONCURRENCY", 2)),
+    "research_papers": int(os.getenv("ARXIV_CONCURRENCY", 2)),
+}
+SOURCE_DEADLINES = {
+    "huggingface_models": float(os.getenv("HF_DEADLINE", 15)),
+    "huggingface_datasets": float(os.getenv("HF_DEADLINE", 15)),
+    "kaggle_datasets": float(os.getenv("KAGGLE_DEADLINE", 20)),
+    "github_repositories": float(os.getenv("GITHUB_DEADLINE", 15)),
+    "research_papers": float(os.getenv("ARXIV_DEADLINE", 20)),
+}
+
+# Use cases whose keyword sets overlap at least this much (Jaccard) share one
+# lookup per source instead of querying again
+QUERY_DEDUPE_THRESHOLD = float(os.getenv("QUERY_DEDUPE_THRESHOLD", 0.75))
+# Up to this many unique queries go to arXiv/GitHub as one OR-query (1 disables)
+RESOURCE_BATCH_SIZE = int(os.getenv("RESOURCE_BATCH_SIZE", 3))
 
-api = KaggleApi()
-api.authenticate()
+# Words that carry no meaning for a resource search
+QUERY_STOPWORDS = frozenset("""
+a an and as at based by driven enabled for from in into of on or powered the to using via with
+ai ml artificial intelligence machine learning
+""".split())
 
 def fetch_huggingface_models(query, limit=5):
     """Fetch relevant Hugging Face models based on the input query.
@@ -25,10 +65,10 @@ def fetch_huggingface_models(query, limit=5):
     Returns:
         list: A list of dictionaries containing model names and their URLs.
     """
-    url = f"https://huggingface.co/api/models?search={query}"
+    url = f"{HUGGINGFACE_API_URL}/models"
     
     try:
-        response = requests.get(url)
+        response = cached_get("huggingface", url, params={"search": query})
         response.raise_for_status()
         models = response.json()
 
@@ -56,10 +96,10 @@ def fetch_huggingface_datasets(query, limit=5):
     Returns:
         list: A list of dictionaries containing dataset names and their URLs.
     """
-    url = f"https://huggingface.co/api/datasets?search={query}"
+    url = f"{HUGGINGFACE_API_URL}/datasets"
     
     try:
-        response = requests.get(url)
+        response = cached_get("huggingface", url, params={"search": query})
         response.raise_for_status()
         datasets = response.json()
 
@@ -88,7 +128,10 @@ def fetch_kaggle_datasets(query, limit=5):
         list: A list of dictionaries containing dataset names and their URLs.
     """
     try:
-        datasets = api.dataset_list(search=query)
+        rate_limiter.acquire("kaggle")
+        # The Kaggle SDK makes its own HTTP calls, so time it here
+        with span("kaggle", kind="upstream", upstream="kaggle"):
+            datasets = get_kaggle_api().dataset_list(search=query)
         
         if not datasets:
             return [{"message": "No relevant datasets found"}]
@@ -101,6 +144,9 @@ def fetch_kaggle_datasets(query, limit=5):
         return dataset_list
     
     except Exception as e:
+        # The Kaggle SDK raises ApiException with the HTTP status as `status`
+        if getattr(e, "status", None) == 429:
+            rate_limiter.backoff("kaggle")
         return [{"error": str(e)}]
     
 
@@ -108,11 +154,11 @@ def search_arxiv_papers(query):
     """
     Search arXiv for research papers related to the input query.
     """
-    url = "http://export.arxiv.org/api/query"
+    url = ARXIV_API_URL
     params = {"search_query": query, "start": 0, "max_results": 5}
 
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = cached_get("arxiv", url, params=params)
         response.raise_for_status()  # Raise HTTPError for bad responses (4xx, 5xx)
 
         root = ET.fromstring(response.content)
@@ -140,7 +186,7 @@ def fetch_github_repos(query, limit=5, github_token=None):
     Returns:
         list: A list of dictionaries containing repository names and their URLs.
     """
-    url = "https://api.github.com/search/repositories"
+    url = f"{GITHUB_API_URL}/search/repositories"
     headers = {"Accept": "application/vnd.github.v3+json"}
     
     if github_token:
@@ -154,7 +200,7 @@ def fetch_github_repos(query, limit=5, github_token=None):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = cached_get("github", url, params=params, headers=headers)
         response.raise_for_status()
         data = response.json()
         
@@ -172,35 +218,354 @@ def fetch_github_repos(query, limit=5, github_token=None):
         return [{"error": str(e)}]
          
 
+def query_keywords(title):
+    """Search keywords of a use case title: lowercased, stopwords dropped, in order."""
+    keywords = []
+    for word in re.findall(r"[a-z0-9]+", title.lower()):
+        if word not in QUERY_STOPWORDS and word not in keywords:
+            keywords.append(word)
+    return keywords
+
+
+def _stem(word):
+    """Crude suffix stripping so "forecasting"/"forecasts"/"forecast" compare equal."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4 and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+
+def split_batch_results(items, keyword_lists, limit, text_of):
+    """Hand the results of one OR-query back to the queries it was built from.
+
+    Each item goes to the query (or queries, on a tie) whose keywords it
+    mentions most, and each query keeps at most `limit` items in the order
+    the source ranked them.
+    """
+    keyword_sets = [{_stem(word) for word in keywords} for keywords in keyword_lists]
+    split = [[] for _ in keyword_lists]
+    for item in items:
+        words = {_stem(word) for word in re.findall(r"[a-z0-9]+", text_of(item).lower())}
+        scores = [len(keywords & words) for keywords in keyword_sets]
+        best = max(scores, default=0)
+        if not best:
+            continue
+        for position, score in enumerate(scores):
+            if score == best and len(split[position]) < limit:
+                split[position].append(item)
+    return split
+
+
+def search_arxiv_papers_batch(keyword_lists, limit=5):
+    """Search arXiv for several keyword queries with one OR-query.
+
+    Returns one list of papers per query, shaped like `search_arxiv_papers`.
+    """
+    url = ARXIV_API_URL
+    clauses = ["(" + " AND ".join(f"all:{word}" for word in keywords[:3]) + ")" for keywords in keyword_lists]
+    params = {"search_query": " OR ".join(clauses), "start": 0, "max_results": 2 * limit * len(keyword_lists)}
+
+    try:
+        response = cached_get("arxiv", url, params=params)
+        response.raise_for_status()
+
+        root = ET.fromstring(response.content)
+        entries = []
+        for entry in root.findall("{http://www.w3.org/2005/Atom}entry"):
+            entries.append({
+                "title": entry.findtext("{http://www.w3.org/2005/Atom}title", "").strip(),
+                "url": entry.findtext("{http://www.w3.org/2005/Atom}id", "").strip(),
+                "summary": entry.findtext("{http://www.w3.org/2005/Atom}summary", ""),
+            })
+
+        split = split_batch_results(entries, keyword_lists, limit, lambda e: e["title"] + " " + e["summary"])
+        return [
+            [{"title": e["title"], "url": e["url"]} for e in papers] or [{"message": "No papers found"}]
+            for papers in split
+        ]
+
+    except (requests.exceptions.RequestException, ET.ParseError) as e:
+        return [[{"error": f"Failed to fetch papers: {e}"}]] * len(keyword_lists)
+
+
+def fetch_github_repos_batch(keyword_lists, limit=5, github_token=None):
+    """Search GitHub for several keyword queries with one OR-query.
+
+    Each query contributes its two leading keywords as a phrase (GitHub
+    allows at most five operators per search). Returns one list of
+    repositories per query, shaped like `fetch_github_repos`.
+    """
+    url = f"{GITHUB_API_URL}/search/repositories"
+    headers = {"Accept": "application/vnd.github.v3+json"}
+
+    if github_token:
+        headers["Authorization"] = f"token {github_token}"
+
+    params = {
+        "q": " OR ".join(f'"{" ".join(keywords[:2])}"' for keywords in keyword_lists),
+        "sort": "stars",
+        "order": "desc",
+        "per_page": min(2 * limit * len(keyword_lists), 100)
+    }
+
+    try:
+        response = cached_get("github", url, params=params, headers=headers)
+        response.raise_for_status()
+        items = response.json().get("items", [])
+
+        def text_of(repo):
+            return " ".join([repo["full_name"], repo.get("description") or "", " ".join(repo.get("topics") or [])])
+
+        split = split_batch_results(items, keyword_lists, limit, text_of)
+        return [
+            [{"name": repo["full_name"], "url": repo["html_url"]} for repo in repos]
+            or [{"message": "No relevant repositories found"}]
+            for repos in split
+        ]
+
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return [[{"error": str(e)}]] * len(keyword_lists)
+
+
+# Source key in the output -> fetch function taking the use case title
+RESOURCE_SOURCES = {
+    "huggingface_models": fetch_huggingface_models,
+    "huggingface_datasets": fetch_huggingface_datasets,
+    "kaggle_datasets": fetch_kaggle_datasets,
+    "github_repositories": lambda query: fetch_github_repos(query, github_token=GITHUB_TOKEN),
+    "research_papers": search_arxiv_papers,
+}
+
+# Sources that accept OR-queries -> fetch function taking a list of keyword
+# lists and returning one result list per query
+BATCH_SOURCES = {
+    "github_repositories": lambda keyword_lists: fetch_github_repos_batch(keyword_lists, github_token=GITHUB_TOKEN),
+    "research_papers": search_arxiv_papers_batch,
+}
+
+# One bounded pool per source, shared by all requests, so a slow source can
+# only ever tie up its own slots. Lookups that overrun their deadline keep
+# running in the background and never block the request that gave up on them.
+_executors = {
+    source: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=source)
+    for source, limit in SOURCE_CONCURRENCY.items()
+}
+# Lookups made inside `rate_limit.patient` (batch runs) may sleep for minutes
+# waiting for a rate limit token, so they get pools of their own and never
+# hold the slots of interactive lookups.
+_patient_executors = {
+    source: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"{source}_patient")
+    for source, limit in SOURCE_CONCURRENCY.items()
+}
+
+
+class _Lookup:
+    """One unique query to one source, shared by every use case it matches."""
+
+    def __init__(self, query, keywords):
+        self.query = query
+        self.keywords = keywords
+        self.key = {_stem(word) for word in keywords}
+        self.indexes = []
+        self.result = None
+
+    def matches(self, key):
+        if not key or not self.key:
+            return key == self.key
+        return len(key & self.key) / len(key | self.key) >= QUERY_DEDUPE_THRESHOLD
+
+
+def _run_lookups(source, lookups):
+    """Run one source call for `lookups`, returning one result list per lookup.
+
+    Unexpected failures become an error slot for every lookup in the call.
+    """
+    try:
+        with span(f"lookup_{source}", queries=len(lookups)):
+            if len(lookups) == 1:
+                return [RESOURCE_SOURCES[source](lookups[0].query)]
+            return BATCH_SOURCES[source]([lookup.keywords for lookup in lookups])
+    except Exception as e:
+        return [[{"error": str(e)}]] * len(lookups)
+
+
+def _timeout_error(source, timeout):
+    return [{"error": f"{source} lookup timed out after {timeout:g}s"}]
+
+
+class LookupMemo:
+    """Resource lookup results kept for reuse by other collectors, e.g. the
+    collectors of every company in one batch.
+
+    Results are matched on the exact set of keyword stems; error and timeout
+    results are not kept, so a later use case retries them.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, source, key):
+        with self._lock:
+            result = self._results.get((source, frozenset(key)))
+            if result is not None:
+                self.hits += 1
+            return result
+
+    def put(self, source, key, result):
+        if any("error" in item for item in result):
+            return
+        with self._lock:
+            self._results.setdefault((source, frozenset(key)), result)
+
+
+class ResourceCollector:
+    """Fans resource lookups out per use case and gathers them back.
+
+    Use cases can be added one at a time, e.g. as their titles stream out of
+    the LLM, so their lookups start right away; `iter_completed` then yields
+    each use case once all of its sources have answered or hit their
+    deadline, which is measured from when its lookup was sent.
+
+    Titles are reduced to keyword queries first. Each new query is looked up
+    in the local resource index and only goes to the live source if the
+    index has too few matches. A use case whose keywords (nearly) match an
+    earlier one's shares that lookup rather than issuing its own, and
+    queries to sources that accept OR-queries are held until
+    RESOURCE_BATCH_SIZE of them are pending (or iteration starts) and then
+    sent as one call whose results are split back per query. With a shared
+    LookupMemo, queries another collector already answered are reused too.
+    """
+
+    def __init__(self, shared=None):
+        self.shared = shared
+        self.titles = []
+        self._slots = []
+        self._lookups = {source: [] for source in RESOURCE_SOURCES}
+        self._pending = {source: [] for source in BATCH_SOURCES}
+        self._outstanding = {}
+        self._ready = set()
+
+    def add(self, title):
+        """Start (or join) the lookups for one use case and return its index."""
+        index = len(self.titles)
+        logger.info("Collecting resources for: %s", title)
+        self.titles.append(title)
+        self._slots.append({})
+
+        keywords = query_keywords(title) or [title]
+        query = " ".join(keywords)
+        key = {_stem(word) for word in keywords}
+        for source in RESOURCE_SOURCES:
+            lookup = next((lookup for lookup in self._lookups[source] if lookup.matches(key)), None)
+            if lookup is None:
+                lookup = _Lookup(query, keywords)
+                self._lookups[source].append(lookup)
+                # The local index answers in milliseconds; only misses go upstream
+                lookup.result = search_index(source, keywords)
+                if lookup.result is None and self.shared is not None:
+                    lookup.result = self.shared.get(source, lookup.key)
+                if lookup.result is None:
+                    self._schedule(source, lookup)
+            lookup.indexes.append(index)
+            if lookup.result is not None:
+                self._fill(lookup, source, lookup.result)
+        return index
+
+    @property
+    def lookup_count(self):
+        """Unique (query, source) lookups planned so far."""
+        return sum(len(lookups) for lookups in self._lookups.values())
+
+    def _schedule(self, source, lookup):
+        if source in BATCH_SOURCES and RESOURCE_BATCH_SIZE > 1:
+            self._pending[source].append(lookup)
+            if len(self._pending[source]) >= RESOURCE_BATCH_SIZE:
+                self._flush(source)
+        else:
+            self._submit(source, [lookup])
+
+    def _flush(self, source):
+        if self._pending[source]:
+            self._submit(source, self._pending[source])
+            self._pending[source] = []
+
+    def _submit(self, source, lookups):
+        # A patient lookup may spend up to its patience waiting for a rate
+        # limit token on top of the usual deadline
+        max_wait = patience()
+        executors = _patient_executors if max_wait else _executors
+        timeout = SOURCE_DEADLINES[source] + max_wait
+        future = executors[source].submit(in_context(_run_lookups), source, lookups)
+        self._outstanding[future] = (source, lookups, timeout, time.monotonic() + timeout)
+
+    def _fill(self, lookup, source, result):
+        lookup.result = result
+        if self.shared is not None:
+            self.shared.put(source, lookup.key, result)
+        for index in lookup.indexes:
+            if source not in self._slots[index]:
+                self._slots[index][source] = result
+                self._ready.add(index)
+
+    def _entry(self, index):
+        return {
+            "title": self.titles[index],
+            "resources": {source: self._slots[index][source] for source in RESOURCE_SOURCES},
+        }
+
+    def iter_completed(self):
+        """Yield (index, entry) pairs in completion order until every use case is done."""
+        for source in self._pending:
+            self._flush(source)
+
+        outstanding = self._outstanding
+        while outstanding or self._ready:
+            if outstanding:
+                next_deadline = min(deadline for _, _, _, deadline in outstanding.values())
+                done, _ = wait(outstanding, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    source, lookups, _, _ = outstanding.pop(future)
+                    for lookup, result in zip(lookups, future.result()):
+                        self._fill(lookup, source, result)
+
+                # Give up on lookups whose source deadline has passed
+                now = time.monotonic()
+                for future, (source, lookups, timeout, deadline) in list(outstanding.items()):
+                    if now >= deadline:
+                        future.cancel()
+                        del outstanding[future]
+                        for lookup in lookups:
+                            self._fill(lookup, source, _timeout_error(source, timeout))
+
+            ready, self._ready = self._ready, set()
+            for index in sorted(ready):
+                if len(self._slots[index]) == len(RESOURCE_SOURCES):
+                    yield index, self._entry(index)
+
+
+def iter_resources_for_usecases(use_cases_json):
+    """Collect resources for every use case, yielding each one as soon as it is complete.
+
+    Yields (index, entry) pairs in completion order, where `index` is the
+    position of the use case in the input and `entry` has the same shape as
+    the items of `collect_resources_for_usecases(...)["use_cases_resources"]`.
+    """
+    collector = ResourceCollector()
+    # Submit every (use case, source) lookup up front so they all run concurrently
+    for use_case in use_cases_json["use_cases"]:
+        collector.add(use_case["title"])
+    yield from collector.iter_completed()
+
+
 # Main function to process use cases
 def collect_resources_for_usecases(use_cases_json):
     # use_cases = use_cases_json["Usecases"]["use_cases"]
-    use_cases = use_cases_json["use_cases"]
-    resource_collection = []
-
-    for use_case in use_cases:
-        title = use_case["title"]
-        print(f"Collecting resources for: {title}")
-
-        # models = search_huggingface(title)
-        models = fetch_huggingface_models(title)
-        hf_datasets = fetch_huggingface_datasets(title)
-        kaggle_datasets = fetch_kaggle_datasets(title)
-        github_repos = fetch_github_repos(title, GITHUB_TOKEN)
-        papers = search_arxiv_papers(title)
-
-        resource_collection.append({
-            "title": title,
-            "resources": {
-                "huggingface_models": models,
-                "huggingface_datasets": hf_datasets,
-                "kaggle_datasets": kaggle_datasets,
-                "github_repositories": github_repos,
-                "research_papers": papers
-            }
-        })
+    resource_collection = dict(iter_resources_for_usecases(use_cases_json))
     
-    return {"use_cases_resources": resource_collection}
+    return {"use_cases_resources": [resource_collection[i] for i in sorted(resource_collection)]}
 
 
 # Example JSON input (You should replace this with actual input)
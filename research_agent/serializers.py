@@ -1,4 +1,16 @@
 from rest_framework import serializers
 
+from .batch import BATCH_MAX_QUERIES, BUNDLE_FORMATS
+
 class ResearchRequestSerializer(serializers.Serializer):
     query = serializers.CharField(max_length=200, required=True)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    queries = serializers.ListField(
+        child=serializers.CharField(max_length=200), min_length=1, max_length=BATCH_MAX_QUERIES
+    )
+    # Company runs of this batch at once (at most BATCH_WORKERS)
+    concurrency = serializers.IntegerField(min_value=1, required=False)
+    # Also bundle the reports' PDFs: "zip" or "combined"
+    pdf = serializers.ChoiceField(choices=sorted(BUNDLE_FORMATS), required=False)
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from filelock import FileLock, Timeout
+
+from .cache import CACHE_DIR
+from .models import ResearchResult, normalize_company
+from .pipeline import run_research
+from .reports import render_pdf_in_background
+
+logger = logging.getLogger(__name__)
+
+LOCKS_DIR = os.path.join(CACHE_DIR, "locks")
+# Longest a duplicate waits for another worker's run before running itself
+SINGLEFLIGHT_LOCK_TIMEOUT = float(os.getenv("SINGLEFLIGHT_LOCK_TIMEOUT", 180))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def single_flight(key, fn):
+    """Run `fn(waited_since)` once for concurrent callers with the same `key`.
+
+    Within a process, duplicates block on the first caller's execution and
+    get its result (or exception). Across worker processes, the first caller
+    holds a file lock for `key`; a caller that had to wait for that lock is
+    passed the wall-clock time it started waiting, so `fn` can first look
+    for a result the other worker stored meanwhile and reuse it.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _run_locked(key, fn)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+
+
+def _run_locked(key, fn):
+    os.makedirs(LOCKS_DIR, exist_ok=True)
+    lock_path = os.path.join(LOCKS_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".lock")
+    waited_since = time.time()
+    lock = FileLock(lock_path)
+    try:
+        lock.acquire(timeout=SINGLEFLIGHT_LOCK_TIMEOUT)
+    except Timeout:
+        logger.warning("Gave up waiting for in-flight run of %r after %ss", key, SINGLEFLIGHT_LOCK_TIMEOUT)
+        return fn(waited_since)
+    try:
+        return fn(waited_since)
+    finally:
+        lock.release()
+
+
+def research_once(company_name, shared_lookups=None):
+    """Run and store the research for `company_name`, sharing in-flight runs.
+
+    Concurrent requests for the same normalized company, in this process or
+    any worker using the same cache directory, wait for one pipeline run and
+    all get the ResearchResult it stored. `shared_lookups` is passed on to
+    the pipeline (see `iter_research`).
+    """
+    key = normalize_company(company_name)
+
+    def run(waited_since):
+        shared = ResearchResult.objects.filter(
+            company_key=key, created_at__gte=datetime.fromtimestamp(waited_since, timezone.utc)
+        ).first()
+        if shared is not None:
+            logger.info("Reusing research for %r finished by another worker", key)
+            return shared
+        result = ResearchResult.store(company_name, run_research(company_name, shared_lookups=shared_lookups))
+        render_pdf_in_background(result)
+        return result
+
+    return single_flight(key, run)
@@ -1,3 +1,732 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from benchmarks.stub_server import StubServer
+
+from . import batch, http_client, jobs, rate_limit, reports, resource_index, resources_main, singleflight
+from .format_result import clean_scraped_text
+from .http_client import CircuitBreaker, CircuitOpenError, http_get
+from .models import ResearchJob, ResearchResult
+from .rate_limit import RateLimiter, RateLimitExceeded, patient
+from .research_main import ParagraphCollector
+from .resource_index import ResourceIndex
+from .resources_main import LookupMemo, ResourceCollector, query_keywords, split_batch_results
+from .usecase_main import UseCaseParser, parse_ai_usecases, text as USECASES_SAMPLE
+
+# Not a rate-limited provider, so calls count as source lookups (retried and
+# hedged) without taking rate limit tokens
+PROVIDER = "stub"
+
+
+class StubServerTestCase(SimpleTestCase):
+    """Runs a fresh stub upstream per test; each one is a new host to the client."""
+
+    routes = {}
+
+    def setUp(self):
+        self.server = StubServer(routes=self.routes).start()
+        self.addCleanup(self.server.stop)
+        patcher = mock.patch.multiple(http_client, HTTP_RETRY_BACKOFF=0, HTTP_RETRY_MAX_BACKOFF=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stats(self):
+        return http_client._host_stats(self.server.url)
+
+
+class RetryTests(StubServerTestCase):
+    def setUp(self):
+        self.failures_left = 0
+        self.routes = {"/flaky": self.flaky, "/drop": self.drop}
+        super().setUp()
+
+    def flaky(self, request):
+        if self.failures_left:
+            self.failures_left -= 1
+            return request.send_body(503, b"")
+        request.send_json({"ok": True})
+
+    def drop(self, request):
+        # Hang up without answering
+        request.close_connection = True
+
+    def test_server_errors_are_retried(self):
+        self.failures_left = 2
+        response = http_get(self.server.url + "/flaky", provider=PROVIDER)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.stats().retries, 2)
+
+    def test_last_server_error_is_returned(self):
+        response = http_get(self.server.url + "/status/503", provider=PROVIDER)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests, http_client.HTTP_RETRIES + 1)
+
+    def test_connection_errors_are_retried(self):
+        with self.assertRaises(requests.ConnectionError):
+            http_get(self.server.url + "/drop", provider=PROVIDER)
+        self.assertEqual(self.server.requests, http_client.HTTP_RETRIES + 1)
+
+    def test_client_errors_are_not_retried(self):
+        response = http_get(self.server.url + "/status/404", provider=PROVIDER)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.stats().breaker.failures, 0)
+
+    def test_page_fetches_are_not_retried(self):
+        response = http_get(self.server.url + "/status/503")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests, 1)
+
+
+@mock.patch.object(http_client, "CIRCUIT_FAILURE_THRESHOLD", 3)
+@mock.patch.object(http_client, "CIRCUIT_RESET_TIMEOUT", 0.2)
+class CircuitBreakerTests(StubServerTestCase):
+    def fail(self, times):
+        for _ in range(times):
+            http_get(self.server.url + "/status/503")
+
+    def test_opens_after_threshold(self):
+        self.fail(2)
+        self.assertEqual(self.stats().breaker.state, CircuitBreaker.CLOSED)
+        self.fail(1)
+        self.assertEqual(self.stats().breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            http_get(self.server.url + "/json")
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.stats().breaker.rejected, 1)
+
+    def test_success_resets_failure_count(self):
+        self.fail(2)
+        http_get(self.server.url + "/json")
+        self.fail(2)
+        self.assertEqual(self.stats().breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_opens_after_reset_timeout(self):
+        self.fail(3)
+        time.sleep(0.25)
+        response = http_get(self.server.url + "/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats().breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        self.fail(3)
+        time.sleep(0.25)
+        self.fail(1)
+        self.assertEqual(self.stats().breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            http_get(self.server.url + "/json")
+        self.assertEqual(self.server.requests, 4)
+
+
+@mock.patch.object(http_client, "HTTP_HEDGING", True)
+@mock.patch.object(http_client, "HTTP_HEDGE_MIN_SAMPLES", 5)
+class HedgingTests(StubServerTestCase):
+    def setUp(self):
+        self.stall_next = threading.Event()
+        self.routes = {"/lookup": self.lookup}
+        super().setUp()
+
+    def lookup(self, request):
+        if self.stall_next.is_set():
+            self.stall_next.clear()
+            time.sleep(1)
+            return request.send_json({"copy": "first"})
+        request.send_json({"copy": "hedge"})
+
+    def warm_up(self):
+        for _ in range(5):
+            http_get(self.server.url + "/lookup", provider=PROVIDER)
+
+    def test_no_hedge_before_enough_samples(self):
+        self.stall_next.set()
+        response = http_get(self.server.url + "/lookup", provider=PROVIDER)
+        self.assertEqual(response.json(), {"copy": "first"})
+        self.assertEqual(self.stats().hedges, 0)
+
+    def test_hedge_past_p95_wins(self):
+        self.warm_up()
+        self.stall_next.set()
+        started = time.monotonic()
+        response = http_get(self.server.url + "/lookup", provider=PROVIDER)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(response.json(), {"copy": "hedge"})
+        self.assertEqual(self.stats().hedges, 1)
+        self.assertEqual(self.stats().hedges_won, 1)
+        self.assertEqual(self.server.requests, 7)
+
+    def test_first_response_wins_when_hedge_is_slower(self):
+        self.warm_up()
+        self.server.config["latency"] = 0.3
+        response = http_get(self.server.url + "/lookup", provider=PROVIDER)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats().hedges, 1)
+        self.assertEqual(self.stats().hedges_won, 0)
+
+
+class NearDuplicateSentenceTests(SimpleTestCase):
+    def test_short_sentences_with_new_facts_are_kept(self):
+        text = (
+            "The company operates in 70 countries. The company operates in 70 cities. "
+            "It sells software to hospitals. It sells software to banks."
+        )
+        self.assertEqual(clean_scraped_text(text), text.strip())
+
+    def test_one_word_changes_in_medium_sentences_are_kept(self):
+        text = (
+            "The company operates offices in 70 countries across Europe and Asia. "
+            "The company operates offices in 70 cities across Europe and Asia. "
+            "It sells its accounting software to hospitals across North America. "
+            "It sells its accounting software to banks across North America."
+        )
+        self.assertEqual(clean_scraped_text(text), text.strip())
+
+    def test_reworded_long_sentence_is_dropped(self):
+        first = "Acme builds route planning software that helps delivery fleets cut fuel costs and arrive on time across Europe."
+        repost = "Acme builds route planning software that helps the delivery fleets cut fuel costs and arrive on time across Europe."
+        self.assertEqual(clean_scraped_text(f"{first} {repost}"), first)
+
+    def test_final_period_kept_when_last_sentence_is_dropped(self):
+        first = "Acme builds route planning software for delivery fleets in Europe."
+        second = "It was founded by two engineers who had worked at a logistics startup."
+        self.assertEqual(clean_scraped_text(f"{first} {second} {first[:-1]}"), f"{first} {second}")
+        self.assertEqual(clean_scraped_text(f"{first}\n{second}\n{first[:-1]}"), f"{first} {second}")
+
+
+class ParagraphCollectorTests(SimpleTestCase):
+    def collect(self, html):
+        parser = ParagraphCollector(text_limit=10_000)
+        parser.feed(html)
+        parser.close()
+        return parser.get_text()
+
+    def test_closed_paragraphs(self):
+        self.assertEqual(self.collect("<h1>Title</h1><p>First.</p><div>Menu</div><p>Second.</p>"), "First.\nSecond.")
+
+    def test_unclosed_paragraph_ends_at_next_block(self):
+        html = "<p>First.<p>Second.<div>Menu</div><ul><li>Home</li></ul><p>Third.<h2>Footer</h2>Copyright"
+        self.assertEqual(self.collect(html), "First.\nSecond.\nThird.")
+
+    def test_inline_tags_stay_in_the_paragraph(self):
+        self.assertEqual(self.collect("<p>Acme <b>builds</b> <a href='#'>software</a>.</p>"), "Acme builds software.")
+
+
+class ResultListTests(TestCase):
+    def setUp(self):
+        self.result = ResearchResult.store("Acme", {"company_overview": "Acme builds software."})
+
+    def test_listing_is_staff_only(self):
+        self.assertEqual(self.client.get("/api/results/").status_code, 403)
+        self.client.force_login(User.objects.create_user("visitor"))
+        self.assertEqual(self.client.get("/api/results/").status_code, 403)
+
+    def test_staff_can_list(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = self.client.get("/api/results/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["result_id"] for item in response.json()], [str(self.result.id)])
+
+    def test_result_is_readable_by_id(self):
+        response = self.client.get(f"/api/results/{self.result.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["company_overview"], "Acme builds software.")
+
+
+class JobQueueTests(TransactionTestCase):
+    def test_job_is_claimed_once(self):
+        job = ResearchJob.objects.create(query="Acme")
+        claimers = 8
+        barrier = threading.Barrier(claimers)
+        claimed = []
+
+        def claim():
+            try:
+                barrier.wait()
+                claimed.append(jobs.claim_next_job())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim) for _ in range(claimers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(claimed), claimers)
+        self.assertEqual([claim.id for claim in claimed if claim is not None], [job.id])
+        self.assertEqual(ResearchJob.objects.get(id=job.id).attempts, 1)
+
+    def test_running_job_with_a_heartbeat_is_not_requeued(self):
+        long_ago = timezone.now() - timedelta(seconds=jobs.JOB_STALE_AFTER * 10)
+        alive = ResearchJob.objects.create(
+            query="Acme", status=ResearchJob.RUNNING, started_at=long_ago, heartbeat_at=timezone.now()
+        )
+        dead = ResearchJob.objects.create(
+            query="Globex", status=ResearchJob.RUNNING, started_at=long_ago, heartbeat_at=long_ago
+        )
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(ResearchJob.objects.get(id=alive.id).status, ResearchJob.RUNNING)
+        self.assertEqual(ResearchJob.objects.get(id=dead.id).status, ResearchJob.PENDING)
+
+    @mock.patch.object(jobs, "JOB_HEARTBEAT_INTERVAL", 0.05)
+    def test_running_job_beats(self):
+        ResearchJob.objects.create(query="Acme")
+        job = jobs.claim_next_job()
+        claimed_at = job.heartbeat_at
+        beats = []
+
+        def research(query):
+            time.sleep(0.3)
+            beats.append(ResearchJob.objects.get(id=job.id).heartbeat_at)
+            return ResearchResult.store(query, {})
+
+        with mock.patch.object(jobs, "research_once", research):
+            jobs.run_job(job)
+        self.assertGreater(beats[0], claimed_at)
+        self.assertEqual(ResearchJob.objects.get(id=job.id).status, ResearchJob.SUCCEEDED)
+
+    def test_status_reads_start_no_workers(self):
+        job = ResearchJob.objects.create(query="Acme")
+        with mock.patch.object(jobs, "ensure_workers") as ensure_workers:
+            self.assertEqual(self.client.get(f"/api/jobs/{job.id}/").status_code, 200)
+            self.assertEqual(self.client.get(f"/api/jobs/{job.id}/result/").status_code, 202)
+        ensure_workers.assert_not_called()
+
+
+class DownloadPdfTests(TestCase):
+    def setUp(self):
+        reports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(reports_dir.cleanup)
+        patcher = mock.patch.object(reports, "REPORTS_DIR", reports_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        payload = {"Overview": "Acme builds route planning software.", "Usecases": [], "Resources": {}}
+        self.result = ResearchResult.store("Acme", payload)
+        self.url = f"/api/download_pdf/{self.result.id}/"
+        self.etag = reports.pdf_etag(self.result.payload_hash)
+        with open(reports.render_pdf(self.result.payload_hash, payload), "rb") as f:
+            self.pdf = f.read()
+
+    def download(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_download(self):
+        response, body = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(body, self.pdf)
+
+    def test_matching_etag_is_not_modified(self):
+        response, body = self.download(If_None_Match=f'"other", {self.etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b"")
+
+    def test_range(self):
+        response, body = self.download(Range="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.pdf)}")
+        self.assertEqual(body, self.pdf[100:200])
+
+    def test_suffix_range(self):
+        response, body = self.download(Range="bytes=-100")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes {len(self.pdf) - 100}-{len(self.pdf) - 1}/{len(self.pdf)}")
+        self.assertEqual(body, self.pdf[-100:])
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.download(Range=f"bytes={len(self.pdf)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.pdf)}")
+
+    def test_invalid_range_serves_everything(self):
+        response, body = self.download(Range="bytes=500-100")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.pdf)
+
+    def test_if_range_mismatch_serves_everything(self):
+        response, body = self.download(Range="bytes=100-199", If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.pdf)
+
+    def test_pruned_pdf_is_rendered_again(self):
+        os.remove(reports.pdf_path(self.result.payload_hash))
+        response, body = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body.startswith(b"%PDF"))
+
+    def test_cache_hit_marks_pdf_used(self):
+        path = reports.pdf_path(self.result.payload_hash)
+        os.utime(path, (0, 0))
+        reports.render_pdf(self.result.payload_hash, self.result.payload)
+        self.assertGreater(os.path.getmtime(path), 0)
+
+
+class UseCaseParserTests(SimpleTestCase):
+    def setUp(self):
+        self.expected = parse_ai_usecases(USECASES_SAMPLE)["use_cases"]
+
+    def parse_in_chunks(self, text, sizes):
+        titles = []
+        parser = UseCaseParser(on_title=titles.append)
+        position = 0
+        while position < len(text):
+            size = next(sizes)
+            parser.feed(text[position:position + size])
+            position += size
+        use_cases = [use_case for use_case in parser.close() if use_case["title"]]
+        self.assertEqual(titles, [use_case["title"] for use_case in use_cases])
+        return use_cases
+
+    def random_sizes(self, seed):
+        rng = random.Random(seed)
+        while True:
+            yield rng.randint(1, 40)
+
+    def test_sample_is_parsed(self):
+        self.assertEqual(len(self.expected), 5)
+        self.assertEqual(self.expected[0]["title"], "Dynamic Pricing Optimization & Demand Forecasting")
+        self.assertTrue(all(use_case["explanation"] and use_case["practical_application"] for use_case in self.expected))
+
+    def test_any_chunk_split(self):
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assertEqual(self.parse_in_chunks(USECASES_SAMPLE, self.random_sizes(seed)), self.expected)
+
+    def test_one_character_at_a_time(self):
+        self.assertEqual(self.parse_in_chunks(USECASES_SAMPLE, itertools.repeat(1)), self.expected)
+
+    def test_crlf_line_endings(self):
+        text = USECASES_SAMPLE.replace("\n", "\r\n")
+        self.assertEqual(parse_ai_usecases(text)["use_cases"], self.expected)
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assertEqual(self.parse_in_chunks(text, self.random_sizes(seed)), self.expected)
+
+    def test_last_item_without_trailing_newline(self):
+        text = USECASES_SAMPLE.rstrip("\n")
+        self.assertEqual(parse_ai_usecases(text)["use_cases"], self.expected)
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assertEqual(self.parse_in_chunks(text, self.random_sizes(seed)), self.expected)
+
+    def test_trailing_title_without_newline(self):
+        text = USECASES_SAMPLE + "\n*   **6. Smart Fleet Maintenance:**"
+        expected = parse_ai_usecases(text)["use_cases"]
+        self.assertEqual([use_case["title"] for use_case in expected][-1], "Smart Fleet Maintenance")
+        self.assertEqual(expected[:5], self.expected)
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assertEqual(self.parse_in_chunks(text, self.random_sizes(seed)), expected)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        locks_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(locks_dir.cleanup)
+        patcher = mock.patch.object(singleflight, "LOCKS_DIR", locks_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = []
+
+    def run_concurrently(self, key, fn, callers=8):
+        barrier = threading.Barrier(callers)
+        outcomes = []
+
+        def call():
+            barrier.wait()
+            try:
+                outcomes.append(singleflight.single_flight(key, fn))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def research(self, waited_since):
+        self.calls.append(waited_since)
+        time.sleep(0.2)
+        return object()
+
+    def test_concurrent_callers_share_one_run(self):
+        outcomes = self.run_concurrently("acme", self.research)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(outcomes), 8)
+        self.assertTrue(all(outcome is outcomes[0] for outcome in outcomes))
+
+    def test_concurrent_callers_share_the_error(self):
+        def fail(waited_since):
+            self.calls.append(waited_since)
+            time.sleep(0.2)
+            raise RuntimeError("pipeline failed")
+
+        outcomes = self.run_concurrently("acme", fail)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(outcomes), 8)
+        self.assertTrue(all(isinstance(outcome, RuntimeError) for outcome in outcomes))
+
+    def test_later_and_other_keys_run_again(self):
+        first = singleflight.single_flight("acme", self.research)
+        self.assertIsNot(singleflight.single_flight("acme", self.research), first)
+        self.assertIsNot(singleflight.single_flight("globex", self.research), first)
+        self.assertEqual(len(self.calls), 3)
+
+
+class QueryKeywordTests(SimpleTestCase):
+    def test_stopwords_and_repeats_are_dropped(self):
+        self.assertEqual(
+            query_keywords("AI-Powered Demand Forecasting for Retail: forecasting demand with ML"),
+            ["demand", "forecasting", "retail"],
+        )
+
+
+class SplitBatchResultsTests(SimpleTestCase):
+    def split(self, titles, keyword_lists, limit=5):
+        items = [{"title": title} for title in titles]
+        split = split_batch_results(items, keyword_lists, limit, lambda item: item["title"])
+        return [[item["title"] for item in items] for items in split]
+
+    def test_results_go_to_the_query_they_match_most(self):
+        split = self.split(
+            ["Retail demand forecasts", "Fraud detection for payments", "Demand forecasting toolkit", "Cooking recipes"],
+            [["demand", "forecasting", "retail"], ["fraud", "detection", "payments"]],
+        )
+        self.assertEqual(split, [["Retail demand forecasts", "Demand forecasting toolkit"], ["Fraud detection for payments"]])
+
+    def test_ties_go_to_every_query(self):
+        split = self.split(["Demand forecasting and fraud detection"], [["demand", "forecasting"], ["fraud", "detection"]])
+        self.assertEqual(split, [["Demand forecasting and fraud detection"]] * 2)
+
+    def test_limit_keeps_the_source_order(self):
+        split = self.split([f"Demand model {i}" for i in range(5)], [["demand"]], limit=2)
+        self.assertEqual(split, [["Demand model 0", "Demand model 1"]])
+
+
+@mock.patch.object(resources_main, "search_index", lambda source, keywords: None)
+@mock.patch.object(resources_main, "RESOURCE_BATCH_SIZE", 3)
+class ResourceDedupeTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = {source: [] for source in resources_main.RESOURCE_SOURCES}
+        lookups = {source: self.lookup(source) for source in resources_main.RESOURCE_SOURCES}
+        batches = {source: self.batch(source) for source in resources_main.BATCH_SOURCES}
+        for patcher in (
+            mock.patch.dict(resources_main.RESOURCE_SOURCES, lookups),
+            mock.patch.dict(resources_main.BATCH_SOURCES, batches),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def lookup(self, source):
+        def fetch(query):
+            self.calls[source].append([query])
+            return [{"title": f"{source}: {query}"}]
+        return fetch
+
+    def batch(self, source):
+        def fetch(keyword_lists):
+            self.calls[source].append([" ".join(keywords) for keywords in keyword_lists])
+            return [[{"title": f"{source}: {' '.join(keywords)}"}] for keywords in keyword_lists]
+        return fetch
+
+    def collect(self, titles, shared=None):
+        collector = ResourceCollector(shared)
+        for title in titles:
+            collector.add(title)
+        entries = dict(collector.iter_completed())
+        return [entries[index]["resources"] for index in range(len(titles))]
+
+    def test_near_duplicate_titles_share_a_lookup(self):
+        resources = self.collect([
+            "Demand Forecasting for Retail Stores",
+            # 4 of 5 keyword stems shared: Jaccard 0.8
+            "Demand Forecasts for Retail Stores and Warehouses",
+            # 2 of 5 shared: Jaccard 0.4
+            "Demand Forecasting for Airlines",
+        ])
+        self.assertEqual(resources[0], resources[1])
+        self.assertNotEqual(resources[0], resources[2])
+        queries = ["demand forecasting retail stores", "demand forecasting airlines"]
+        for source in resources_main.RESOURCE_SOURCES:
+            if source in resources_main.BATCH_SOURCES:
+                # Both distinct queries go out as one OR-query
+                self.assertEqual(self.calls[source], [queries], source)
+            else:
+                self.assertEqual(self.calls[source], [[query] for query in queries], source)
+
+    def test_memo_reuses_another_collectors_lookups(self):
+        memo = LookupMemo()
+        first = self.collect(["Fraud Detection in Payments"], shared=memo)
+        second = self.collect(["Payments Fraud Detection"], shared=memo)
+        self.assertEqual(first, second)
+        self.assertEqual(memo.hits, len(resources_main.RESOURCE_SOURCES))
+        self.assertTrue(all(len(calls) == 1 for calls in self.calls.values()))
+
+    def test_memo_keeps_no_errors(self):
+        memo = LookupMemo()
+        memo.put("research_papers", {"fraud"}, [{"error": "timed out"}])
+        self.assertIsNone(memo.get("research_papers", {"fraud"}))
+
+
+@mock.patch.object(rate_limit, "RATE_LIMIT_ENABLED", True)
+@mock.patch.object(rate_limit, "DEFAULT_MAX_WAIT", 0.1)
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.limiter = RateLimiter(os.path.join(scratch.name, "rate_limits.sqlite3"))
+        # A token every half second
+        patcher = mock.patch.dict(rate_limit.PROVIDER_RATES, {PROVIDER: 120})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def drain(self):
+        # The upstream's remaining budget caps the bucket
+        self.limiter.observe(PROVIDER, self.response(X_RateLimit_Remaining="1"))
+        self.limiter.acquire(PROVIDER)
+
+    def response(self, status_code=200, **headers):
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update({name.replace("_", "-"): value for name, value in headers.items()})
+        return response
+
+    def test_calls_past_max_wait_are_shed(self):
+        self.drain()
+        with self.assertRaises(RateLimitExceeded) as raised:
+            self.limiter.acquire(PROVIDER)
+        self.assertAlmostEqual(raised.exception.retry_after, 0.5, delta=0.1)
+        self.assertEqual(self.limiter.stats()[PROVIDER]["shed"], 1)
+
+    def test_patient_calls_wait_for_a_token(self):
+        self.drain()
+        started = time.monotonic()
+        with patient(2):
+            self.limiter.acquire(PROVIDER)
+        self.assertGreater(time.monotonic() - started, 0.3)
+        stats = self.limiter.stats()[PROVIDER]
+        self.assertEqual((stats["granted"], stats["throttled"], stats["shed"]), (2, 1, 0))
+
+    def test_no_remaining_budget_blocks_the_provider(self):
+        with self.assertLogs(rate_limit.logger, "WARNING"):
+            self.limiter.observe(PROVIDER, self.response(X_RateLimit_Remaining="0", X_RateLimit_Reset="60"))
+        self.assertAlmostEqual(self.limiter.try_acquire(PROVIDER), 60, delta=2)
+        with patient(2), self.assertRaises(RateLimitExceeded):
+            self.limiter.acquire(PROVIDER)
+
+    def test_retry_after_blocks_the_provider(self):
+        with self.assertLogs(rate_limit.logger, "WARNING"):
+            self.limiter.observe(PROVIDER, self.response(429, Retry_After="120"))
+        self.assertAlmostEqual(self.limiter.try_acquire(PROVIDER), 120, delta=2)
+        self.assertEqual(self.limiter.stats()[PROVIDER]["blocked_for"], 120)
+
+
+class ResourceIndexTests(SimpleTestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.index = ResourceIndex(os.path.join(scratch.name, "resource_index.sqlite3"))
+
+    def repository(self, name, description, stars=0):
+        return {"full_name": name, "description": description, "stargazers_count": stars}
+
+    def test_missing_index_is_a_miss(self):
+        self.assertIsNone(self.index.search("github_repositories", ["demand", "forecasting"]))
+        self.assertEqual(self.index.stats(), {})
+
+    def test_ingest_then_search(self):
+        loaded = self.index.ingest("github_repositories", [
+            self.repository("acme/forecast-kit", "Demand forecasts for retail stores"),
+            self.repository("acme/demand-forecasting", "Forecasting demand with gradient boosting"),
+            self.repository("acme/retail-demand", "Retail demand forecasting notebooks"),
+            self.repository("acme/fraud", "Fraud detection for card payments"),
+            {"description": "No name, skipped"},
+        ])
+        self.assertEqual(loaded, 4)
+        self.assertEqual(self.index.stats()["github_repositories"]["items"], 4)
+
+        results = self.index.search("github_repositories", ["demand", "forecasting"])
+        # Porter stemming matches "forecasts"; a match in the name ranks first
+        self.assertEqual(results[0], {"name": "acme/demand-forecasting", "url": "https://github.com/acme/demand-forecasting"})
+        self.assertEqual({result["name"] for result in results}, {
+            "acme/forecast-kit", "acme/demand-forecasting", "acme/retail-demand",
+        })
+        # Each source is searched on its own, and too few matches is a miss
+        self.assertIsNone(self.index.search("huggingface_models", ["demand", "forecasting"]))
+        self.assertIsNone(self.index.search("github_repositories", ["fraud", "detection"]))
+
+    def test_popularity_breaks_ties(self):
+        self.index.ingest("github_repositories", [
+            self.repository(f"acme/forecasting-{stars}", "Demand forecasting", stars=stars) for stars in (0, 5000, 50)
+        ])
+        results = self.index.search("github_repositories", ["demand", "forecasting"])
+        self.assertEqual([result["name"] for result in results], [
+            "acme/forecasting-5000", "acme/forecasting-50", "acme/forecasting-0",
+        ])
+
+    def test_replace_drops_the_previous_entries(self):
+        self.index.ingest("github_repositories", [self.repository("acme/old", "Demand forecasting")])
+        self.index.ingest("github_repositories", [self.repository("acme/new", "Fraud detection")])
+        self.assertEqual(self.index.stats()["github_repositories"]["items"], 1)
+        with mock.patch.object(resource_index, "RESOURCE_INDEX_MIN_RESULTS", 1):
+            self.assertIsNone(self.index.search("github_repositories", ["demand"]))
+            self.assertEqual([result["name"] for result in self.index.search("github_repositories", ["fraud"])], ["acme/new"])
+
+
+@mock.patch.object(batch, "_research")
+class BatchTests(SimpleTestCase):
+    queries = ["Acme", "acme ", "Globex", "Failing Co", "Initech"]
+
+    def research(self, company_name, lookups):
+        time.sleep(0.05)
+        if company_name.startswith("Failing"):
+            raise RuntimeError(f"{company_name} failed")
+        return company_name.upper()
+
+    def outcomes(self, items):
+        return sorted((index, query, str(outcome)) for index, query, outcome in items)
+
+    def test_runs_each_company_once(self, research):
+        research.side_effect = self.research
+        outcomes = self.outcomes(batch.Batch(self.queries, concurrency=2).iter_completed())
+        self.assertEqual(outcomes, [
+            (0, "Acme", "ACME"), (1, "acme ", "ACME"), (2, "Globex", "GLOBEX"),
+            (3, "Failing Co", "Failing Co failed"), (4, "Initech", "INITECH"),
+        ])
+        self.assertEqual(research.call_count, 4)
+
+    def test_async_iteration_matches(self, research):
+        research.side_effect = self.research
+
+        async def collect():
+            return [item async for item in batch.Batch(self.queries, concurrency=2).aiter_completed()]
+
+        self.assertEqual(
+            self.outcomes(asyncio.run(collect())),
+            self.outcomes(batch.Batch(self.queries, concurrency=2).iter_completed()),
+        )
+
+    def test_closing_cancels_queued_runs(self, research):
+        research.side_effect = self.research
+        completed = batch.Batch(self.queries, concurrency=1).iter_completed()
+        next(completed)
+        completed.close()
+        time.sleep(0.2)
+        # At most the run started next to replace the first one
+        self.assertLessEqual(research.call_count, 2)
@@ -0,0 +1,177 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+slow_logger = logging.getLogger("research_agent.slow")
+
+# Spans slower than this (seconds) are logged to the "research_agent.slow"
+# logger: outbound calls (HTTP, Gemini, Kaggle) and pipeline stages.
+SLOW_CALL_SECONDS = float(os.getenv("SLOW_CALL_SECONDS", 3))
+SLOW_STAGE_SECONDS = float(os.getenv("SLOW_STAGE_SECONDS", 15))
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels, kept in this process."""
+
+    def __init__(self, name, help, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), count, total) for key, (counts, count, total) in self._series.items()}
+        for key, (counts, count, total) in sorted(series.items()):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            prefix = labels + "," if labels else ""
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "research_stage_seconds", "Time spent in each research pipeline stage.", ("stage",)
+)
+UPSTREAM_SECONDS = Histogram(
+    "research_upstream_seconds", "Time spent in outbound calls, by upstream and outcome.", ("upstream", "outcome")
+)
+REQUEST_SECONDS = Histogram(
+    "research_request_seconds", "End-to-end time of research requests, by endpoint.", ("endpoint",)
+)
+HISTOGRAMS = [REQUEST_SECONDS, STAGE_SECONDS, UPSTREAM_SECONDS]
+
+
+class Trace:
+    """Spans recorded while handling one request, across the threads it fans out to."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.total = None
+
+    def timings(self):
+        """The `timings` block: total, per-stage aggregates and every span."""
+        total = self.total if self.total is not None else time.perf_counter() - self.started
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] = round(stage["total_ms"] + span["duration_ms"], 1)
+            stage["max_ms"] = max(stage["max_ms"], span["duration_ms"])
+        return {
+            "total_ms": round(total * 1000, 1),
+            "stages": stages,
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+        }
+
+
+_current_trace = contextvars.ContextVar("research_trace", default=None)
+
+
+@contextmanager
+def trace():
+    """Collect the spans recorded inside the block (and in work it hands to
+    threads through `in_context`) into a Trace."""
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        current.total = time.perf_counter() - current.started
+        _current_trace.reset(token)
+
+
+def in_context(fn):
+    """Wrap `fn` to run in a copy of the caller's context, so spans it records
+    from a pool thread land in the caller's trace."""
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so each call
+    # runs in its own copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+@contextmanager
+def span(name, kind="stage", **attrs):
+    """Time a block as one span.
+
+    `kind="stage"` spans feed research_stage_seconds; `kind="upstream"`
+    spans (outbound calls, with an `upstream` attribute) feed
+    research_upstream_seconds. Either is added to the current trace, and
+    logged as a slow call when it runs past its threshold. The block may
+    set `attrs["outcome"]`; it defaults to "ok", or "error" if it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except GeneratorExit:
+        # A generator holding the span was closed before it finished
+        attrs.setdefault("outcome", "cancelled")
+        raise
+    except BaseException as e:
+        attrs.setdefault("outcome", "error")
+        attrs.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        attrs.setdefault("outcome", "ok")
+        _record(name, kind, started, duration, attrs)
+
+
+def _record(name, kind, started, duration, attrs):
+    if kind == "upstream":
+        UPSTREAM_SECONDS.observe(duration, upstream=attrs.get("upstream", name), outcome=attrs["outcome"])
+        threshold = SLOW_CALL_SECONDS
+    else:
+        STAGE_SECONDS.observe(duration, stage=name)
+        threshold = SLOW_STAGE_SECONDS
+
+    current = _current_trace.get()
+    if current is not None:
+        current.spans.append({
+            "name": name,
+            "start_ms": round((started - current.started) * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+            **attrs,
+        })
+
+    if duration >= threshold:
+        slow_logger.warning(json.dumps(
+            {"event": "slow_call", "span": name, "kind": kind, "duration_ms": round(duration * 1000, 1), **attrs},
+            default=str,
+        ))
+
+
+def render_metrics():
+    """All histograms in the Prometheus text exposition format."""
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
@@ -1,8 +1,21 @@
 from django.contrib import admin
 from django.urls import path, include
-from .views import main, download_pdf
+from .views import main, research_stream, download_pdf, list_results, get_result, cache_stats, rate_limits, upstreams, startup_stats, create_job, job_status, job_result, batch_research, download_batch_bundle
 
 urlpatterns = [
     path('main/', main, name="main"),
+    path("stream/", research_stream, name="research_stream"),
+    path("batch/", batch_research, name="batch_research"),
+    path("batch/bundles/<str:name>/", download_batch_bundle, name="download_batch_bundle"),
     path("download_pdf/", download_pdf, name="download_pdf"),
+    path("download_pdf/<uuid:result_id>/", download_pdf, name="download_result_pdf"),
+    path("results/", list_results, name="list_results"),
+    path("results/<uuid:result_id>/", get_result, name="get_result"),
+    path("cache_stats/", cache_stats, name="cache_stats"),
+    path("rate_limits/", rate_limits, name="rate_limits"),
+    path("upstreams/", upstreams, name="upstreams"),
+    path("startup/", startup_stats, name="startup_stats"),
+    path("jobs/", create_job, name="create_job"),
+    path("jobs/<uuid:job_id>/", job_status, name="job_status"),
+    path("jobs/<uuid:job_id>/result/", job_result, name="job_result"),
 ]
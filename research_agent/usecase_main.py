@@ -1,54 +1,274 @@
 import os
 import re
 import json
-from google import genai
 from dotenv import load_dotenv
+from .llm_cache import cached_generate_content, stream_generate_content
 
 load_dotenv()
 
-# Configure Gemini API key
-GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Stream Gemini's output and parse it as it arrives (two-step path only)
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() not in ("0", "false", "no")
+# Ask for the overview and the structured use cases in a single Gemini call
+LLM_FUSED_MODE = os.getenv("LLM_FUSED_MODE", "false").lower() in ("1", "true", "yes")
 
-def generate_ai_usecases(company_name, company_summary):
-    """Generates the top 5 relevant AI/ML use cases for the given company in bullet points."""
-    prompt = (
+# Response schema for the fused call (OpenAPI subset understood by Gemini)
+RESEARCH_BUNDLE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "overview": {"type": "STRING"},
+        "use_cases": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "title": {"type": "STRING"},
+                    "explanation": {"type": "STRING"},
+                    "practical_application": {"type": "ARRAY", "items": {"type": "STRING"}},
+                },
+                "required": ["title", "explanation", "practical_application"],
+            },
+        },
+    },
+    "required": ["overview", "use_cases"],
+}
+
+USECASES_MODEL = "gemini-2.0-flash"
+
+
+def _usecases_prompt(company_name, company_summary):
+    return (
         f"Based on the following company summary, suggest the **top 5 most impactful** AI and Machine Learning use cases "
         f"that {company_name} can implement. Provide practical applications aligned with the company's industry and services. "
         f"Format the response as a **clear, structured bullet-point list**, with each use case briefly explained:\n\n{company_summary}"
     )
 
-    model = "gemini-2.0-flash"
 
-    response = client.models.generate_content(
-        model=model,
-        contents=prompt
-    )
+def generate_ai_usecases(company_name, company_summary):
+    """Generates the top 5 relevant AI/ML use cases for the given company in bullet points."""
+    return cached_generate_content(USECASES_MODEL, _usecases_prompt(company_name, company_summary))
+
+
+def stream_ai_usecases(company_name, company_summary):
+    """Like generate_ai_usecases, but yields the text in chunks as Gemini writes it."""
+    return stream_generate_content(USECASES_MODEL, _usecases_prompt(company_name, company_summary))
+
+# Line patterns for the use-case parser. Each one is anchored and only ever
+# applied to a single line, so parsing stays linear in the size of the output.
+_BULLET_RE = re.compile(r"^(?:[*\-+\u2022]|\d+[.)])\s+")
+_HEADING_MARK_RE = re.compile(r"^#{1,6}\s+")
+_NUMBERED_RE = re.compile(r"^(?:\*\*|__)?\s*(\d+)[.)]\s+(.*)$")
+_BOLD_RE = re.compile(r"^(?:\*\*|__)(.+?)(?:\*\*|__)\s*:?\s*(.*)$")
+_LABEL_RE = re.compile(
+    r"^(?:\*\*|__)?\s*(explanation|description|practical applications?|applications?|examples?)"
+    r"\s*(?::\s*(?:\*\*|__)?|(?:\*\*|__)\s*:)\s*(.*)$",
+    re.IGNORECASE,
+)
+_FIELDS = {
+    "explanation": "explanation",
+    "description": "explanation",
+}
+
+
+def _strip_markup(text):
+    return text.strip().strip("*_").strip().rstrip(":").strip().strip("*_").strip()
+
+
+class UseCaseParser:
+    """Single-pass, incremental parser for the markdown use-case list Gemini returns.
+
+    Feed it text as it arrives (whole responses or streamed chunks); it works
+    line by line and tolerates the usual format drift: `*`/`-`/numbered
+    bullets, `###` headings, bold or plain titles, "Explanation"/"Description"
+    and "Practical Application(s)" labels with or without bold, and titles
+    followed by their explanation on the same line.
+
+    Titles are reported through `on_title` the moment their line is complete,
+    before the rest of the use case has been generated.
+    """
+
+    def __init__(self, on_title=None):
+        self.on_title = on_title  # Called with each title as soon as its line is parsed
+        self.use_cases = []
+        self._pending = []  # Pieces of the current, not yet terminated line
+        self._current = None
+        self._field = None
+        self._title_indent = None
+        self._after_blank = False
+        self._implicit_explanation = False
+
+    def feed(self, chunk):
+        """Consume more text and return the use cases completed by it."""
+        completed_before = len(self.use_cases)
+        if "\n" not in chunk:
+            self._pending.append(chunk)
+            return []
+        first, *lines = chunk.split("\n")
+        self._pending.append(first)
+        lines.insert(0, "".join(self._pending))
+        self._pending = [lines.pop()]
+        for line in lines:
+            self._parse_line(line.rstrip("\r"))
+        return self.use_cases[completed_before:]
+
+    def close(self):
+        """Flush any buffered text and return every parsed use case."""
+        line = "".join(self._pending)
+        self._pending = []
+        if line:
+            self._parse_line(line.rstrip("\r"))
+        self._finish()
+        return self.use_cases
+
+    @property
+    def current_title(self):
+        """Title of the use case being parsed right now, if any."""
+        return self._current["title"] if self._current else None
+
+    def _finish(self):
+        if self._current is not None:
+            self.use_cases.append(self._current)
+        self._current = None
+        self._field = None
+
+    def _start(self, title, rest, indent):
+        self._finish()
+        self._current = {"title": title, "explanation": "", "practical_application": []}
+        if title and self.on_title is not None:
+            self.on_title(title)
+        self._title_indent = indent if self._title_indent is None else min(self._title_indent, indent)
+        self._implicit_explanation = bool(rest)
+        if rest:
+            # "1. **Title**: explanation" with the applications as sub-bullets
+            self._field = "explanation"
+            self._add_text(rest, bulleted=False)
+
+    def _add_text(self, text, bulleted):
+        if self._field == "practical_application":
+            items = self._current["practical_application"]
+            if bulleted or not items:
+                items.append(text)
+            else:
+                items[-1] = f"{items[-1]} {text}"
+        elif self._field == "explanation":
+            explanation = self._current["explanation"]
+            self._current["explanation"] = f"{explanation} {text}" if explanation else text
+
+    def _parse_line(self, line):
+        content = line.strip()
+        if not content:
+            self._after_blank = True
+            return
+        after_blank, self._after_blank = self._after_blank, False
+        indent = len(line) - len(line.lstrip())
+
+        # Strip list bullets and markdown heading marks, remembering they were there
+        is_heading = bool(_HEADING_MARK_RE.match(content))
+        content = _HEADING_MARK_RE.sub("", content)
+        bullet = _BULLET_RE.match(content)
+        bare = content[bullet.end():] if bullet and not content[:1].isdigit() else content
+
+        # "1. Title", "**1. Title:**", "### 2) Title" start a new use case
+        numbered = _NUMBERED_RE.match(bare)
+        if numbered and int(numbered.group(1)) == len(self.use_cases) + (2 if self._current else 1):
+            is_bold = bare.startswith(("**", "__")) or numbered.group(2).startswith(("**", "__"))
+            top_level = self._title_indent is None or indent <= self._title_indent
+            if is_bold or is_heading or top_level:
+                self._start_from(numbered.group(2), indent)
+                return
+
+        # "Explanation:", "**Practical Application:** ..." switch the current field
+        label = _LABEL_RE.match(bare)
+        if label and self._current is not None:
+            name = label.group(1).lower()
+            self._field = _FIELDS.get(name, "practical_application")
+            self._implicit_explanation = False
+            if label.group(2):
+                self._add_text(_strip_markup(label.group(2)), bulleted=True)
+            return
+
+        # An unnumbered bold line at title level, e.g. "* **Fraud Detection:**"
+        bold = _BOLD_RE.match(bare)
+        top_level = self._title_indent is None or indent <= self._title_indent
+        if bold and (is_heading or top_level) and (self._current is None or self._field is not None):
+            # Before any use case, only a bulleted or heading bold line counts as a title
+            is_preamble = self._current is None and not self.use_cases and not (bullet or is_heading)
+            if not is_preamble:
+                self._start_from(bare, indent)
+                return
+
+        if self._current is None:
+            return  # Preamble before the first use case
+        if after_blank and indent == 0 and not bullet and not is_heading:
+            # Unindented paragraph after a blank line: closing remarks, not part of a use case
+            self._finish()
+            return
+        if bullet and self._implicit_explanation:
+            self._field = "practical_application"
+            self._implicit_explanation = False
+        self._add_text(_strip_markup(bare), bulleted=bool(bullet))
+
+    def _start_from(self, text, indent):
+        bold = _BOLD_RE.match(text)
+        if bold:
+            title, rest = bold.group(1), bold.group(2)
+        elif "**" in text or "__" in text:
+            # "1. Title:** rest" -- the bold started before the number
+            title, rest = re.split(r"\*\*|__", text, maxsplit=1)
+        elif ":" in text:
+            title, rest = text.split(":", 1)
+        else:
+            title, rest = text, ""
+        self._start(_strip_markup(title), _strip_markup(rest), indent)
 
-    return response.text
 
 def parse_ai_usecases(text):
     """
     Parses the AI/ML use cases generated by the generate_ai_usecases() function
     and converts them into a structured JSON format.
     """
-    use_cases = []
-    
-    # Splitting the text into individual use cases based on bullet points
-    pattern = re.findall(r"\*\s+\*\*(\d+)\.\s+(.+?):\*\*\n\s+\*\s+\*\*Explanation:\*\*\s+(.+?)\n\s+\*\s+\*\*Practical Application:\*\*\s+(.+?)(?=\n\n\*|$)", text, re.DOTALL)
-    
-    for _, title, explanation, applications in pattern:
-        # Splitting practical applications into a list
-        practical_application = [app.strip() for app in applications.split("\n") if app.strip()]
-        
-        use_cases.append({
-            "title": title.strip(),
-            "explanation": explanation.strip(),
-            "practical_application": practical_application
-        })
-    
+    parser = UseCaseParser()
+    parser.feed(text)
+    use_cases = [use_case for use_case in parser.close() if use_case["title"]]
     return {"use_cases": use_cases} 
 
+def generate_overview_and_usecases(company_name, scraped_info):
+    """Generates the company overview and its top 5 AI/ML use cases in one Gemini call.
+
+    Returns (overview, {"use_cases": [...]}) in the same shapes as the two-step
+    path. Raises ValueError if the model's JSON is missing or malformed.
+    """
+    prompt = (
+        f"You are researching the company {company_name}. Using the company details below:\n"
+        "1. Write a 200 words concise and well-structured summary as `overview`. "
+        "Ensure key information is retained while removing redundancy and unnecessary details. "
+        "Focus on the company's core business, major milestones, and recent developments.\n"
+        f"2. Suggest the top 5 most impactful AI and Machine Learning use cases that {company_name} can implement "
+        "as `use_cases`. Each needs a short `title`, a brief `explanation` and a list of "
+        "`practical_application` entries aligned with the company's industry and services.\n\n"
+        f"{scraped_info}"
+    )
+
+    model = "gemini-2.0-flash"
+    config = {"response_mime_type": "application/json", "response_schema": RESEARCH_BUNDLE_SCHEMA}
+
+    try:
+        data = json.loads(cached_generate_content(model, prompt, config))
+        overview = data["overview"].strip()
+        use_cases = [
+            {
+                "title": use_case["title"].strip(),
+                "explanation": use_case["explanation"].strip(),
+                "practical_application": [app.strip() for app in use_case["practical_application"] if app.strip()],
+            }
+            for use_case in data["use_cases"]
+        ]
+    except (TypeError, KeyError, AttributeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Malformed fused research response: {e}") from e
+
+    if not overview or not use_cases:
+        raise ValueError("Fused research response is missing the overview or use cases")
+    return overview, {"use_cases": use_cases}
+
 def generate_structured_usecases(company_name, reseach_result):
     use_cases = generate_ai_usecases(company_name, reseach_result)
     return parse_ai_usecases(use_cases)
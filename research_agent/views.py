@@ -1,72 +1,455 @@
+import asyncio
 import requests
+import json
 import os
-from rest_framework.decorators import api_view
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from django.http import FileResponse
+from django.http import FileResponse, HttpResponse
 from rest_framework import status
 import logging
 from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from .research_main import *
 from .usecase_main import *
 from .resources_main import *
-from .pdf_generator import generate_pdf
+from .reports import open_pdf, parse_range, pdf_etag, render_pdf_in_background
+from .llm_cache import llm_cache_stats
+from .http_cache import http_cache_stats
+from .rate_limit import rate_limit_stats
+from .http_client import upstream_stats
+from .clients import STARTUP_TIMINGS
+from .pipeline import iter_research
+from .models import ResearchJob, ResearchResult, normalize_company
+from .serializers import BatchRequestSerializer, ResearchRequestSerializer
+from .batch import Batch, bundle_path, bundle_pending, start_bundle
+from .jobs import submit_job
+from .singleflight import research_once
+from .tracing import REQUEST_SECONDS, render_metrics, trace
 
 logger = logging.getLogger(__name__)
 
-@api_view(['POST'])
-def main(request):
+# Longest a client may long-poll a job result, and how often we re-check it
+JOB_MAX_WAIT = 60
+JOB_POLL_STEP = 0.5
+# Most results returned by one listing call
+RESULTS_PAGE_SIZE = 50
+# Pipeline runs executing at once in this process. The research views are
+# async, so requests waiting for a slot only hold a coroutine, not a thread
+RESEARCH_WORKERS = int(os.getenv("RESEARCH_WORKERS", 16))
+
+_research_executor = ThreadPoolExecutor(max_workers=RESEARCH_WORKERS, thread_name_prefix="research")
+
+
+def in_research_pool(fn):
+    """Wrap blocking `fn` (the pipeline, ORM calls) into a coroutine function
+    that runs it on the research pool, in the caller's context."""
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False, executor=_research_executor)
+
+
+def _request_data(request):
+    """The POST body as a dict (JSON or form-encoded), or None if it is malformed."""
+    if request.content_type != "application/json":
+        return request.POST
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@csrf_exempt
+@require_POST
+async def main(request):
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
     # fetch the company name
-    company_name = request.data.get("query", "").strip()
-    print(f"Conducting market research: {company_name}")
-    
-    # Step 1 : Market research
-    research_results = get_summarized_info(company_name)
-    # print(research_results)
-    
-    # Step 2 : AI/Ml use cases generation
-    use_cases = generate_structured_usecases(company_name, research_results)
-    # print(use_cases)
-
-    # Step 3: Generate relevant resources for each usecases
-    resources = collect_resources_for_usecases(use_cases)
-    # print(resources)
-
-    # Prepare response data
-    response_data = {
-        "message": f"Successfully completed the research for {company_name}",
-        "Overview": research_results,
-        "Usecases": use_cases,
-        "Resources": resources
+    company_name = str(data.get("query", "")).strip()
+
+    # Search, use cases and resources for the company; identical concurrent
+    # queries share one run
+    with trace() as current:
+        result = await in_research_pool(research_once)(company_name)
+    REQUEST_SECONDS.observe(current.total, endpoint="main")
+    response_data = {**result.payload, "result_id": str(result.id)}
+
+    # Opt-in per-stage breakdown; a run shared with another request has no
+    # spans of its own
+    if _wants_timings(data.get("timings") or request.GET.get("timings")):
+        response_data["timings"] = current.timings()
+
+    return JsonResponse(response_data, status=200)
+
+
+def _wants_timings(flag):
+    return str(flag).lower() in ("1", "true", "yes")
+
+
+def metrics(request):
+    """Stage, upstream and request latency histograms in the Prometheus text format."""
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def save_result(company_name, response_data):
+    """Store the report under its own result id and return it with that id attached."""
+    result = ResearchResult.store(company_name, response_data)
+    render_pdf_in_background(result)
+    return {**response_data, "result_id": str(result.id)}
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_research(company_name):
+    try:
+        for event, data in iter_research(company_name):
+            if event == "done":
+                data = save_result(company_name, data)
+            yield sse_event(event, data)
+    except Exception as e:
+        logger.exception("Streaming research for %s failed", company_name)
+        yield sse_event("error", {"error": str(e)})
+
+
+async def _iterate_in_research_pool(iterator):
+    """Async iterator over a blocking one, advancing it on the research pool."""
+    step = in_research_pool(next)
+    done = object()
+    try:
+        while (item := await step(iterator, done)) is not done:
+            yield item
+    finally:
+        # Also runs when the client disconnects and the response is cancelled
+        await in_research_pool(iterator.close)()
+
+
+@require_GET
+async def research_stream(request):
+    """Stream pipeline results as Server-Sent Events while each stage completes."""
+    serializer = ResearchRequestSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    company_name = serializer.validated_data["query"].strip()
+
+    events = stream_research(company_name)
+    # Under ASGI the stream is served asynchronously; a WSGI server (e.g.
+    # runserver) would buffer an async iterator whole, so it gets the plain one
+    if hasattr(request, "scope"):
+        events = _iterate_in_research_pool(events)
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop proxies from buffering the stream
+    return response
+
+
+def ndjson_line(data):
+    return json.dumps(data, ensure_ascii=False, default=str) + "\n"
+
+
+def stream_batch(batch, bundle_format=None):
+    """One NDJSON line per query as its run finishes, then a summary line
+    (with the PDF bundle's URL when one was asked for)."""
+    started = time.monotonic()
+    outcomes = {}
+    try:
+        for index, query, outcome in batch.iter_completed():
+            outcomes[index] = outcome
+            yield _batch_outcome_line(index, query, outcome)
+    except Exception as e:
+        logger.exception("Batch research failed")
+        yield ndjson_line({"done": True, "error": str(e)})
+        return
+    yield _batch_summary_line(batch, outcomes, bundle_format, started)
+
+
+async def astream_batch(batch, bundle_format=None):
+    """`stream_batch` for ASGI servers. It waits for the runs on the event
+    loop, so a batch holds no research pool thread however long it takes."""
+    started = time.monotonic()
+    outcomes = {}
+    try:
+        async for index, query, outcome in batch.aiter_completed():
+            outcomes[index] = outcome
+            yield _batch_outcome_line(index, query, outcome)
+    except Exception as e:
+        logger.exception("Batch research failed")
+        yield ndjson_line({"done": True, "error": str(e)})
+        return
+    yield _batch_summary_line(batch, outcomes, bundle_format, started)
+
+
+def _batch_outcome_line(index, query, outcome):
+    if isinstance(outcome, Exception):
+        return ndjson_line({"index": index, "query": query, "status": "failed", "error": str(outcome)})
+    return ndjson_line({
+        "index": index, "query": query, "status": "succeeded",
+        **outcome.payload, "result_id": str(outcome.id),
+    })
+
+
+def _batch_summary_line(batch, outcomes, bundle_format, started):
+    results = {index: outcome for index, outcome in outcomes.items() if not isinstance(outcome, Exception)}
+    summary = {
+        "done": True,
+        "queries": len(batch.queries),
+        "companies": batch.company_count,
+        "succeeded": len(results),
+        "failed": len(outcomes) - len(results),
+        "shared_lookups": batch.lookups.hits,
+        "elapsed_s": round(time.monotonic() - started, 1),
     }
+    if bundle_format and results:
+        # A company asked for twice is bundled once
+        reports = list({results[i].id: results[i] for i in sorted(results)}.values())
+        try:
+            # Built on the PDF render pool; the URL answers 202 until it's ready
+            summary["pdf_url"] = reverse("download_batch_bundle", args=[start_bundle(reports, bundle_format)])
+        except Exception as e:
+            logger.exception("Bundling the PDFs of a batch failed")
+            summary["pdf_error"] = str(e)
+    return ndjson_line(summary)
 
-    # Save response as result.json in the project root
-    project_root = os.path.dirname(os.path.abspath(__file__))  
-    result_file_path = os.path.join(project_root, "result.json")
 
-    with open(result_file_path, "w", encoding="utf-8") as f:
-        json.dump(response_data, f, indent=4, ensure_ascii=False)
-    
-    return Response(response_data, status=status.HTTP_200_OK)
+@csrf_exempt
+@require_POST
+async def batch_research(request):
+    """Research a list of companies, streaming one NDJSON line per company as it finishes."""
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+    serializer = BatchRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
 
+    batch = Batch(serializer.validated_data["queries"], serializer.validated_data.get("concurrency"))
+    # As for research_stream, only an ASGI server can stream an async iterator
+    stream = astream_batch if hasattr(request, "scope") else stream_batch
+    lines = stream(batch, serializer.validated_data.get("pdf"))
+    response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+    response["X-Accel-Buffering"] = "no"
+    return response
 
-def stream_file(file_path):
-    with open(file_path, "rb") as f:
-        while chunk := f.read(8192):  # Read in 8KB chunks
-            yield chunk
 
 @api_view(['GET'])
-def download_pdf(request):
-    json_file = "research_agent/result.json"
-    file_path = "final_proposal.pdf"  
+def download_batch_bundle(request, name):
+    """A batch's PDF bundle: a zip of per-company PDFs or one combined PDF."""
+    path = bundle_path(name)
+    # The marker goes only once the bundle is in place, so look for it first
+    if bundle_pending(name):
+        response = JsonResponse({"status": "building"}, status=202)
+        response["Retry-After"] = "2"
+        return response
+    try:
+        bundle = open(path, "rb") if path else None
+    except FileNotFoundError:
+        bundle = None
+    if bundle is None:
+        return JsonResponse({"error": "Bundle not found"}, status=404)
+    extension = os.path.splitext(name)[1]
+    content_type = "application/zip" if extension == ".zip" else "application/pdf"
+    response = FileResponse(bundle, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="Research_Reports{extension}"'
+    return response
+
+
+def stream_file(f, start=0, length=None):
+    with f:
+        f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = f.read(8192 if remaining is None else min(8192, remaining))  # Read in 8KB chunks
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
 
-    if not os.path.exists(json_file):
-        return JsonResponse({"error": "JSON file not found"}, status=404)
 
-    generate_pdf(json_file, file_path)
+def _etag_matches(header, etag):
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
 
-    if os.path.exists(file_path):
-        response = StreamingHttpResponse(stream_file(file_path), content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="Research_Report.pdf"'
+
+@api_view(['GET'])
+def download_pdf(request, result_id=None):
+    result_id = result_id or request.query_params.get("result_id")
+    # Never fall back to the latest report: it may belong to someone else. A
+    # report can only be read by whoever holds its id
+    if not result_id:
+        return JsonResponse({"error": "result_id is required"}, status=400)
+    try:
+        result = ResearchResult.objects.filter(id=result_id).first()
+    except ValidationError:
+        return JsonResponse({"error": "Invalid result id"}, status=400)
+    if result is None:
+        return JsonResponse({"error": "Result not found"}, status=404)
+
+    # The payload hash identifies the rendered bytes, so it doubles as the ETag
+    etag = pdf_etag(result.payload_hash)
+    if _etag_matches(request.headers.get("If-None-Match", ""), etag):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
         return response
 
-    return JsonResponse({"error": "File not found"}, status=404)
\ No newline at end of file
+    try:
+        pdf = open_pdf(result.payload_hash, result.payload)
+    except Exception as e:
+        logger.exception("Error generating PDF for result %s", result.id)
+        return JsonResponse({"error": f"Error generating PDF: {e}"}, status=500)
+
+    size = os.fstat(pdf.fileno()).st_size
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except ValueError:
+            pdf.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = FileResponse(pdf, content_type='application/pdf')
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            stream_file(pdf, start, end - start + 1), status=206, content_type='application/pdf'
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+
+    response['Content-Disposition'] = 'attachment; filename="Research_Report.pdf"'
+    response["ETag"] = etag
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def list_results(request):
+    """Stored results, newest first; filter with ?company= and ?before=<ISO timestamp>.
+
+    Staff only: a result id is the only thing that gives access to a report.
+    """
+    results = ResearchResult.objects.all()
+    company = request.query_params.get("company")
+    if company:
+        results = results.filter(company_key=normalize_company(company))
+    before = request.query_params.get("before")
+    if before:
+        before = parse_datetime(before)
+        if before is None:
+            return Response({"error": "before must be an ISO 8601 timestamp"}, status=status.HTTP_400_BAD_REQUEST)
+        results = results.filter(created_at__lt=before)
+
+    return Response([
+        {"result_id": str(result.id), "company": result.company, "created_at": result.created_at}
+        for result in results.only("id", "company", "created_at")[:RESULTS_PAGE_SIZE]
+    ], status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def get_result(request, result_id):
+    result = ResearchResult.objects.filter(id=result_id).first()
+    if result is None:
+        return Response({"error": "Result not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({**result.payload, "result_id": str(result.id)}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def startup_stats(request):
+    """Seconds this process spent loading the app and initialising each SDK client."""
+    return Response({"pid": os.getpid(), "timings": STARTUP_TIMINGS}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    return Response({"llm": llm_cache_stats(), "http": http_cache_stats()}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def rate_limits(request):
+    """Remaining request budget per upstream provider, shared by all workers."""
+    return Response(rate_limit_stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def upstreams(request):
+    """Circuit breaker state, p95 latency and retry/hedge counts per upstream host in this worker."""
+    return Response(upstream_stats(), status=status.HTTP_200_OK)
+
+
+def _job_status(job):
+    return {
+        "job_id": str(job.id),
+        "query": job.query,
+        "status": job.status,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+@api_view(['POST'])
+def create_job(request):
+    """Queue a research run and return its job id right away."""
+    serializer = ResearchRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    job = submit_job(serializer.validated_data["query"].strip())
+    return Response(_job_status(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def job_status(request, job_id):
+    job = ResearchJob.objects.filter(id=job_id).first()
+    if job is None:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(_job_status(job), status=status.HTTP_200_OK)
+
+
+@require_GET
+async def job_result(request, job_id):
+    """Return a job's result; `?wait=<seconds>` long-polls until it finishes.
+
+    Async, so a long poll holds no thread while it waits.
+    """
+    job = await ResearchJob.objects.filter(id=job_id).afirst()
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    try:
+        wait = min(max(float(request.GET.get("wait", 0)), 0), JOB_MAX_WAIT)
+    except ValueError:
+        return JsonResponse({"error": "wait must be a number of seconds"}, status=400)
+
+    deadline = time.monotonic() + wait
+    while not job.is_finished and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_STEP)
+        await job.arefresh_from_db()
+
+    if job.status == ResearchJob.SUCCEEDED:
+        report = await ResearchResult.objects.filter(id=job.report_id).afirst()
+        if report is None:
+            return JsonResponse({"error": "Result was deleted"}, status=410)
+        return JsonResponse({**report.payload, "result_id": str(report.id)}, status=200)
+    if job.status == ResearchJob.FAILED:
+        return JsonResponse({**_job_status(job), "error": job.error}, status=500)
+    return JsonResponse(_job_status(job), status=202)